@@ -1,15 +1,31 @@
+import os
+import json
+import time
 import streamlit as st
+from utils.db_handler import get_project, get_project_names
 from utils.folder_structure_generation import generate_rtl_structure, modify_structure, get_structure_by_name
-from utils.folder_setup import create_folders, get_all_project_names, get_project_structure
+from utils.folder_setup import apply_plan, describe_plan, plan_folders
+from utils.jobs import get_job_files, list_jobs, start_workers, submit_job
 from utils.code_generator import generate_code
-from utils.linting import run_linting
-from utils.synthesis import run_synthesis, get_project_list,display_results
+from utils.linting import (DIAGNOSTICS_PAGE_SIZE, count_diagnostics, diagnostic_difference, get_diagnostics,
+                           get_lint_runs, get_previous_lint_run, run_linting, summarize_diagnostics)
+from utils.synthesis import display_results, iter_synthesis, list_synthesis_images
+from utils.tracing import PERCENTILE_RUNS, export_run, get_spans, list_runs, tool_percentiles
 
 # Streamlit App Configuration
 st.set_page_config(page_title="RTL Project Manager", layout="wide")
+JOB_WORKERS = 2
+FOLDER_PLAN_PREVIEW = 500  # Planned paths listed in a dry run
+
+@st.cache_resource
+def start_job_workers():
+    """Start the background job workers once per server process."""
+    return start_workers(JOB_WORKERS)
+
+start_job_workers()
 
 # Navbar for navigation
-menu = ["Folder Structure Generation", "Folder Setup", "Code Generation", "Linting", "Synthesis"]
+menu = ["Folder Structure Generation", "Folder Setup", "Code Generation", "Linting", "Synthesis", "Background Jobs", "Performance"]
 choice = st.sidebar.selectbox("Navigation", menu)
 
 if choice == "Folder Structure Generation":
@@ -19,12 +35,13 @@ if choice == "Folder Structure Generation":
     
     if option == "Generate New Structure":
         user_input = st.text_area("Describe your project:")
+        bypass_cache = st.checkbox("Bypass response cache")
         if st.button("Generate Structure"):
-            structure = generate_rtl_structure(user_input)
+            structure = generate_rtl_structure(user_input, use_cache=not bypass_cache)
             st.json(structure)
     
     elif option == "Modify Existing Structure":
-        projects = get_all_project_names()
+        projects = get_project_names()
         project_name = st.selectbox("Select Project", projects)
         
         if project_name:
@@ -32,7 +49,7 @@ if choice == "Folder Structure Generation":
             st.subheader("Current Structure")
             st.json(current_structure, expanded=False)
             
-            modified_structure = st.text_area("Modify the structure (JSON format):", value=str(current_structure))
+            modified_structure = st.text_area("Modify the structure (JSON format):", value=json.dumps(current_structure, indent=4))
             if st.button("Save Modifications"):
                 try:
                     modify_structure(project_name, modified_structure)
@@ -45,66 +62,255 @@ if choice == "Folder Structure Generation":
 
 elif choice == "Folder Setup":
     st.title("Set Up Project Folder")
-    projects = get_all_project_names()
+    projects = get_project_names()
     project_name = st.selectbox("Select Project", projects)
     base_path = st.text_input("Enter base directory:")
+    dry_run = st.checkbox("Dry run (only show what would be created)")
     if st.button("Create Folders"):
-        structure = get_project_structure(project_name)
-        if structure:
-            project_path = create_folders(base_path, structure)
-            st.success(f"Project folders created at {project_path}")
+        project = get_project(project_name)
+        if project:
+            plan = plan_folders(base_path, project)
+            changes = describe_plan(plan)
+            if dry_run:
+                st.info(f"{len(plan['directories'])} directories and {len(plan['files'])} files would be created "
+                        f"under {plan['root']}; existing paths are left untouched.")
+                st.code("\n".join(changes[:FOLDER_PLAN_PREVIEW]) or "Nothing to create.", language="diff")
+            else:
+                errors = apply_plan(plan)
+                if errors:
+                    st.error("Could not create: " + "; ".join(errors))
+                else:
+                    st.success(f"Project folders set up at {plan['root']} ({len(plan['directories'])} directories "
+                               f"and {len(plan['files'])} files created, existing paths kept).")
         else:
             st.error("No structure found for selected project.")
 
 elif choice == "Code Generation":
     st.title("Generate RTL Code")
-    projects = get_all_project_names()
+    projects = get_project_names()
     project_name = st.selectbox("Select Project", projects)
     project_location = st.text_input("Enter project location:")
+    max_workers = st.number_input("Parallel requests", min_value=1, max_value=32, value=8)
+    requests_per_minute = st.number_input("Extra request limit per minute for this run (0 = none)", min_value=0,
+                                          value=0, help="Applies on top of the process-wide limit set by the "
+                                          "LLM_REQUESTS_PER_MINUTE environment variable (default 60, 0 = unlimited).")
+    bypass_cache = st.checkbox("Bypass response cache")
+    force = st.checkbox("Regenerate all files")
+    stream = st.checkbox("Stream output live")
+    batch_option = st.selectbox("Request batching", ["One request per file", "Batch by directory",
+                                                     "Batch module with testbench"])
     if st.button("Generate Code"):
+        progress_bar = st.progress(0.0)
+        status = st.empty()
+        live_output = st.empty()
+        streamed = {}
+
+        def show_chunk(file_path, text, chars):
+            streamed[file_path] = streamed.get(file_path, "") + text
+            status.text(f"Streaming {file_path}: ~{chars // 4} tokens")
+            live_output.code(streamed[file_path][-4000:], language="verilog")
+
+        def show_progress(done, total, file_path, error):
+            progress_bar.progress(done / total)
+            if error:
+                st.warning(f"⚠ Failed to generate {file_path}: {error}")
+            status.text(f"Generated {done}/{total}: {file_path}")
+
         try:
-            result = generate_code(project_name, project_location)
-            st.success(result)
+            result = generate_code(project_name, project_location, max_workers=int(max_workers),
+                                   requests_per_minute=int(requests_per_minute) or None,
+                                   progress_callback=show_progress, use_cache=not bypass_cache,
+                                   force=force, stream=stream, stream_callback=show_chunk,
+                                   batch={"Batch by directory": "directory",
+                                          "Batch module with testbench": "module"}.get(batch_option))
+            st.success(result["message"])
+            with st.expander("Generation report"):
+                st.json({key: result[key] for key in ("generated", "skipped", "removed", "prompt_tokens")})
         except Exception as e:
             st.error(str(e))
 
 elif choice == "Linting":
     st.title("Run Linting on RTL Code")
     
-    projects = get_all_project_names()
+    projects = get_project_names()
     project_name = st.selectbox("Select Project", projects)
     
     if project_name:
         project_path = st.text_input("Enter project directory:")
+        lint_mode = st.radio("Lint mode", ["Per file", "Whole project"])
+        if lint_mode == "Per file":
+            jobs = st.number_input("Parallel lint jobs (0 = one per CPU core)", min_value=0, value=0)
+            top_module = None
+        else:
+            jobs = 0
+            top_module = st.text_input("Top module (optional):")
+        timeout = st.number_input("Timeout (seconds)", min_value=1, value=60)
         if st.button("Run Linter"):
             try:
-                lint_results = run_linting(project_name, project_path)
+                lint_results = run_linting(project_name, project_path, jobs=int(jobs) or None, timeout=int(timeout),
+                                           mode="project" if lint_mode == "Whole project" else "file",
+                                           top_module=top_module or None)
                 if isinstance(lint_results, str):
                     st.error(lint_results)
                 else:
-                    st.subheader("Linting Results")
-                    for file_name, lint_output in lint_results:
-                        if lint_output:
-                            st.error(f"⚠ Issues in {file_name}")
-                            st.code(lint_output, language="plaintext")
-                        else:
-                            st.success(f"✅ No issues found in {file_name}")
-                st.success("Linting completed.")
+                    with_issues = sum(1 for _, lint_output in lint_results if lint_output)
+                    st.success(f"Linting completed: {len(lint_results)} files, {with_issues} with issues.")
             except Exception as e:
                 st.error(str(e))
 
+        lint_runs = get_lint_runs(project_name)
+        if lint_runs:
+            st.subheader("Diagnostics")
+            lint_run = st.selectbox("Lint run", lint_runs, format_func=lambda run: (
+                f"#{run['id']} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['created_at']))} "
+                f"{run['folder_path']} ({run['errors']} errors, {run['warnings']} warnings)"))
+            previous_run = get_previous_lint_run(lint_run["id"])
+            files_column, errors_column, warnings_column = st.columns(3)
+            files_column.metric("Files", lint_run["files"])
+            errors_column.metric("Errors", lint_run["errors"],
+                                 lint_run["errors"] - previous_run["errors"] if previous_run else None, delta_color="inverse")
+            warnings_column.metric("Warnings", lint_run["warnings"],
+                                   lint_run["warnings"] - previous_run["warnings"] if previous_run else None,
+                                   delta_color="inverse")
+
+            summary = summarize_diagnostics(lint_run["id"])
+            if summary:
+                st.dataframe(summary)
+                severities = st.multiselect("Severity", sorted({row["severity"] for row in summary}))
+                codes = st.multiselect("Code", sorted({row["code"] for row in summary if row["code"]}))
+                file_filter = st.text_input("File name contains:")
+                total = count_diagnostics(lint_run["id"], severities, codes, file_filter)
+                pages = max(1, -(-total // DIAGNOSTICS_PAGE_SIZE))
+                page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+                st.dataframe(get_diagnostics(lint_run["id"], severities, codes, file_filter,
+                                             limit=DIAGNOSTICS_PAGE_SIZE, offset=(page - 1) * DIAGNOSTICS_PAGE_SIZE))
+                st.caption(f"{total} matching diagnostics")
+
+            if previous_run and st.checkbox(f"Compare with previous run #{previous_run['id']}"):
+                new_count, new_diagnostics = diagnostic_difference(lint_run["id"], previous_run["id"])
+                fixed_count, fixed_diagnostics = diagnostic_difference(previous_run["id"], lint_run["id"])
+                st.write(f"**{new_count}** new, **{fixed_count}** fixed (line numbers ignored).")
+                if new_diagnostics:
+                    st.markdown("New diagnostics")
+                    st.dataframe(new_diagnostics)
+                if fixed_diagnostics:
+                    st.markdown("Fixed diagnostics")
+                    st.dataframe(fixed_diagnostics)
+
 elif choice == "Synthesis":
     st.title("Run Synthesis on RTL Code")
-    projects = get_project_list()
+    projects = get_project_names()
     project_name = st.selectbox("Select Project", projects)
     project_path = st.text_input("Enter project directory:")
+    synthesis_mode = st.radio("Synthesis mode", ["Hierarchical (one Yosys session)", "Per file"])
+    top_module = None
+    if synthesis_mode != "Per file":
+        top_module = st.text_input("Top module (optional, detected when empty):")
+    max_workers = st.number_input("Parallel jobs (0 = one per CPU core)", min_value=0, value=0)
+    timeout = st.number_input("Timeout per tool run (seconds)", min_value=1, value=300)
+    force = st.checkbox("Rebuild all netlists")
 
     if st.button("Run Synthesis"):
         try:
-            success_files, error_logs = run_synthesis(project_path, project_name)
-
-            st.success("Synthesis completed.")
+            # Report progress as jobs finish; netlists are shown page by page below
+            mode = "file" if synthesis_mode == "Per file" else "hierarchical"
+            hits = misses = 0
+            errors = {}
+            status = st.empty()
+            for base_name, _, error, cached in iter_synthesis(project_path, project_name, int(max_workers) or None,
+                                                              int(timeout), mode, top_module or None, force):
+                hits, misses = hits + cached, misses + (not cached)
+                if error:
+                    errors[base_name] = error
+                status.text(f"{hits + misses} finished: {hits} up to date, {misses} rebuilt, {len(errors)} failed")
 
-            display_results(success_files, error_logs)  # Show results
+            st.session_state["synthesis_errors"] = errors
+            st.success(f"Synthesis completed ({hits} up to date, {misses} rebuilt).")
         except Exception as e:
             st.error(str(e))
+
+    if project_path:
+        display_results(list_synthesis_images(os.path.join(project_path, "synthesized_images")),
+                        st.session_state.get("synthesis_errors", {}))
+
+elif choice == "Background Jobs":
+    st.title("Background Jobs")
+    st.caption("Jobs run in worker processes, keep their progress in the database and resume after a restart.")
+
+    job_kinds = {"Code Generation": "generate_code", "Linting": "lint", "Synthesis": "synthesis"}
+    kind = st.selectbox("Job type", list(job_kinds))
+    project_name = st.selectbox("Select Project", get_project_names())
+    project_path = st.text_input("Enter project directory:")
+    if st.button("Submit Job"):
+        params = {"generate_code": {"project_location": project_path},
+                  "lint": {"project_folder": project_path},
+                  "synthesis": {"folder_path": project_path, "mode": "hierarchical"}}[job_kinds[kind]]
+        job_id = submit_job(job_kinds[kind], project_name, params)
+        st.success(f"Submitted job #{job_id}.")
+
+    jobs = list_jobs()
+    if jobs:
+        st.subheader("Recent Jobs")
+        st.dataframe([{"id": job["id"], "type": job["kind"], "project": job["project_name"], "status": job["status"],
+                       "progress": f"{job['progress_done']}/{job['progress_total'] or '?'}",
+                       "updated": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job["updated_at"]))}
+                      for job in jobs])
+
+        job = st.selectbox("Job details", jobs, format_func=lambda job: f"#{job['id']} {job['kind']} {job['project_name']}")
+        if job["progress_total"]:
+            st.progress(job["progress_done"] / job["progress_total"])
+        if job["error"]:
+            st.error(job["error"])
+        if job["result"] is not None:
+            st.json(job["result"], expanded=False)
+        st.table([{"file": file_path, "status": status, "detail": detail or ""}
+                  for file_path, status, detail in get_job_files(job["id"])])
+
+    auto_refresh = st.checkbox("Auto-refresh every 2 seconds")
+    if st.button("Refresh") or (auto_refresh and any(job["status"] in ("queued", "running") for job in jobs)):
+        if auto_refresh:
+            time.sleep(2)
+        st.rerun()
+
+elif choice == "Performance":
+    st.title("Performance")
+    st.caption("Code generation, linting, synthesis and pipeline runs record a span for every LLM call, "
+               "tool run and database query.")
+
+    project_name = st.selectbox("Select Project", ["All projects"] + get_project_names())
+    project_filter = None if project_name == "All projects" else project_name
+
+    stats = tool_percentiles(project_filter)
+    if stats:
+        st.subheader(f"Latency per Tool (last {PERCENTILE_RUNS} runs)")
+        st.dataframe([{"kind": stat["kind"], "name": stat["name"], "calls": stat["count"],
+                       "p50 (ms)": round(stat["p50"] * 1000, 1), "p95 (ms)": round(stat["p95"] * 1000, 1),
+                       "total (s)": round(stat["total"], 2)} for stat in stats])
+
+    runs = list_runs(project_filter)
+    if not runs:
+        st.info("No traced runs yet.")
+    else:
+        st.subheader("Run Timeline")
+        run = st.selectbox("Run", runs, format_func=lambda run: f"#{run['id']} {run['kind']} {run['project_name']} "
+                           f"({run['ended_at'] - run['started_at']:.1f}s, {run['status']})")
+        show_queries = st.checkbox("Show database queries")
+        timeline = [{"span": f"{span['kind']} {span['name']}", "start (s)": span["started_at"] - run["started_at"],
+                     "end (s)": span["started_at"] - run["started_at"] + span["duration"],
+                     "duration (ms)": round(span["duration"] * 1000, 1), "exit code": span["exit_code"],
+                     "bytes in": span["bytes_in"], "bytes out": span["bytes_out"], "tokens in": span["tokens_in"],
+                     "tokens out": span["tokens_out"], "detail": json.dumps(span["detail"]) if span["detail"] else ""}
+                    for span in get_spans(run["id"]) if show_queries or span["kind"] != "db"]
+        if run["error"]:
+            st.error(run["error"])
+        if timeline:
+            import altair as alt  # Only this page draws charts
+            st.altair_chart(alt.Chart(alt.Data(values=timeline)).mark_bar().encode(
+                x=alt.X("start (s):Q"), x2="end (s):Q", y=alt.Y("span:N"), tooltip=["span:N", "duration (ms):Q"]),
+                use_container_width=True)
+            st.dataframe(timeline)
+
+        export_path = st.text_input("OpenTelemetry (OTLP/JSON) export file", value="traces.jsonl")
+        if st.button("Export Run"):
+            export_run(run["id"], export_path)
+            st.success(f"Run #{run['id']} appended to {export_path}.")
@@ -0,0 +1,27 @@
+import json
+import pytest
+from utils import db_handler, llm_cache
+from utils.benchmark import FakeClient, synthetic_structure
+from utils.llm_client import ResilientClient
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Point the main database and the prompt cache at fresh files under tmp_path."""
+    monkeypatch.setattr(db_handler, "DB_NAME", str(tmp_path / "database" / "folder_structure.db"))
+    monkeypatch.setattr(llm_cache, "CACHE_DB", str(tmp_path / "database" / "llm_cache.db"))
+    db_handler.invalidate_cache()
+    yield tmp_path
+    db_handler.close_connection()
+    db_handler.close_connection(llm_cache.CACHE_DB)
+    db_handler.invalidate_cache()
+
+@pytest.fixture
+def fake_client():
+    """The benchmark's fake Gemini client behind the real retry layer, without latency or rate limit."""
+    return ResilientClient(FakeClient(0), requests_per_minute=None)
+
+@pytest.fixture
+def project(database):
+    """A stored synthetic project with four design files and no testbenches; returns its name."""
+    db_handler.save_project_structure("demo", "Test project", json.dumps(synthetic_structure("demo", 4)))
+    return "demo"
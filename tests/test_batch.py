@@ -0,0 +1,23 @@
+import json
+import pytest
+from utils import folder_structure_generation
+from utils.batch import run_stage
+from utils.benchmark import synthetic_structure
+
+@pytest.fixture
+def structure_reply(fake_client, monkeypatch):
+    """Answer structure prompts with the given text instead of a module."""
+    def reply(text):
+        monkeypatch.setattr(fake_client.client.models, "respond", lambda contents: text)
+    monkeypatch.setattr(folder_structure_generation, "get_client", lambda: fake_client)
+    return reply
+
+def test_structure_stage_returns_the_project_name(database, structure_reply):
+    structure_reply(json.dumps(synthetic_structure("alu", 2)))
+    assert run_stage("structure", "An ALU", use_cache=False) == {"project_name": "alu"}
+
+@pytest.mark.parametrize("reply", ["Sorry, I cannot help with that.", json.dumps({"project_name": "alu"})])
+def test_structure_stage_fails_without_a_usable_structure(database, structure_reply, reply):
+    structure_reply(reply)
+    with pytest.raises(ValueError):
+        run_stage("structure", "An ALU", use_cache=False)
@@ -0,0 +1,115 @@
+import os
+import json
+import pytest
+from utils import db_handler
+from utils.benchmark import FakeModels, synthetic_structure
+from utils.code_generator import FenceStripper, clean_code, generate_code, group_files, parse_batch_response
+
+RESPONSE = FakeModels(0).respond("**File Path:** src/alu.v")
+
+def test_unchanged_project_makes_no_requests_on_rerun(project, database, fake_client):
+    location = str(database / project)
+    first = generate_code(project, location, llm_client=fake_client)
+    assert len(first["generated"]) == 4
+    assert fake_client.client.models.calls == 4
+
+    second = generate_code(project, location, llm_client=fake_client)
+    assert second["generated"] == []
+    assert sorted(second["skipped"]) == sorted(first["generated"])
+    assert fake_client.client.models.calls == 4
+
+def test_missing_file_is_regenerated(project, database, fake_client):
+    location = str(database / project)
+    generate_code(project, location, llm_client=fake_client, use_cache=False)
+    os.remove(os.path.join(location, "rtl_00", "unit_0001.v"))
+    result = generate_code(project, location, llm_client=fake_client, use_cache=False)
+    assert result["generated"] == [os.path.join("rtl_00", "unit_0001.v")]
+    assert fake_client.client.models.calls == 5
+
+def test_new_testbench_prompt_includes_the_existing_module_interface(project, database, fake_client, monkeypatch):
+    location = str(database / project)
+    generate_code(project, location, llm_client=fake_client)
+    structure = synthetic_structure(project, 4)
+    structure["directories"].append({"name": "tb", "files": ["unit_0000_tb.v"], "subdirectories": []})
+    db_handler.save_project_structure(project, "Test project", json.dumps(structure))
+    prompts = []
+    respond = fake_client.client.models.respond
+    monkeypatch.setattr(fake_client.client.models, "respond",
+                        lambda contents: prompts.append(contents) or respond(contents))
+    result = generate_code(project, location, llm_client=fake_client)
+    assert result["generated"] == [os.path.join("tb", "unit_0000_tb.v")]
+    assert "rtl_00/unit_0000.v: module unit_0000" in prompts[0]
+
+def test_forced_rerun_is_answered_from_the_prompt_cache(project, database, fake_client):
+    location = str(database / project)
+    generate_code(project, location, llm_client=fake_client)
+    result = generate_code(project, location, llm_client=fake_client, force=True)
+    assert len(result["generated"]) == 4
+    assert fake_client.client.models.calls == 4
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 64])
+def test_fence_stripper_matches_clean_code_for_any_chunking(size):
+    stripper = FenceStripper()
+    streamed = "".join(stripper.feed(RESPONSE[start:start + size]) for start in range(0, len(RESPONSE), size))
+    assert streamed + stripper.finish() == clean_code(RESPONSE)
+
+def test_fence_stripper_keeps_backticks_that_are_not_fences():
+    stripper = FenceStripper()
+    text = stripper.feed("`define WIDTH 8\n") + stripper.feed("module m; endmodule\n") + stripper.finish()
+    assert text == "`define WIDTH 8\nmodule m; endmodule"
+
+def test_streamed_files_match_the_response(project, database, fake_client):
+    location = str(database / project)
+    chunks = []
+    generate_code(project, location, llm_client=fake_client, stream=True,
+                  stream_callback=lambda file_path, text, chars: chunks.append(text))
+    with open(os.path.join(location, "rtl_00", "unit_0000.v")) as f:
+        assert f.read() == clean_code(FakeModels(0).respond("**File Path:** rtl_00/unit_0000.v"))
+    assert chunks
+
+def test_failed_stream_keeps_the_existing_file(project, database, fake_client):
+    location = str(database / project)
+    generate_code(project, location, llm_client=fake_client, stream=True)
+    file_path = os.path.join(location, "rtl_00", "unit_0000.v")
+    with open(file_path) as f:
+        before = f.read()
+
+    def broken_stream(**kwargs):
+        raise ValueError("quota exhausted")
+        yield
+    fake_client.client.models.generate_content_stream = broken_stream
+    with pytest.raises(RuntimeError):
+        generate_code(project, location, llm_client=fake_client, stream=True, force=True, use_cache=False)
+    with open(file_path) as f:
+        assert f.read() == before
+    assert not os.path.exists(file_path + ".tmp")
+
+def test_parse_batch_response_returns_requested_files_only():
+    paths = [os.path.join("p", "src", "alu.v"), os.path.join("p", "tb", "alu_tb.v")]
+    response = ("===== FILE: src/alu.v =====\n```verilog\nmodule alu; endmodule\n```\n===== END FILE =====\n"
+                "===== FILE: tb/alu_tb.v =====\nmodule alu_tb; endmodule\n===== END FILE =====\n"
+                "===== FILE: src/extra.v =====\nmodule extra; endmodule\n===== END FILE =====\n")
+    assert parse_batch_response(response, paths) == {paths[0]: "module alu; endmodule",
+                                                     paths[1]: "module alu_tb; endmodule"}
+
+def test_parse_batch_response_drops_duplicate_and_empty_blocks():
+    paths = [os.path.join("p", "src", "a.v"), os.path.join("p", "src", "b.v")]
+    response = ("===== FILE: src/a.v =====\nmodule a; endmodule\n===== END FILE =====\n"
+                "===== FILE: src/a.v =====\nmodule a2; endmodule\n===== END FILE =====\n"
+                "===== FILE: src/b.v =====\n```\n```\n===== END FILE =====\n")
+    assert parse_batch_response(response, paths) == {}
+
+def test_group_files_pairs_testbenches_with_their_module():
+    files = ["src/alu.v", "src/tbuf.v", "src/uf.v", "tb/tb_alu.sv", "tb/alu_testbench.sv"]
+    groups = group_files(files, "module", testbenches={"tb/tb_alu.sv", "tb/alu_testbench.sv"})
+    assert sorted(groups) == [["src/alu.v", "tb/tb_alu.sv", "tb/alu_testbench.sv"], ["src/tbuf.v"], ["src/uf.v"]]
+
+def test_group_files_caps_batch_size():
+    files = [f"src/unit_{index}.v" for index in range(5)]
+    assert [len(group) for group in group_files(files, "directory", max_batch_size=2)] == [2, 2, 1]
+
+def test_files_missing_from_a_batched_response_are_retried_one_by_one(project, database, fake_client):
+    # The fake model answers a batch prompt with a single unmarked module, so every file falls back
+    result = generate_code(project, str(database / project), llm_client=fake_client, batch="directory")
+    assert len(result["generated"]) == 4
+    assert fake_client.client.models.calls == 5
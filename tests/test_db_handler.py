@@ -0,0 +1,29 @@
+import json
+import sqlite3
+from utils import db_handler
+from utils.benchmark import synthetic_structure
+
+def execute_elsewhere(sql, parameters):
+    """Run and commit a statement on a separate connection, as another process would."""
+    conn = sqlite3.connect(db_handler.DB_NAME)
+    with conn:
+        conn.execute(sql, parameters)
+    conn.close()
+
+def test_structure_stays_cached_across_unrelated_commits(project):
+    cached = db_handler.get_project(project)
+    execute_elsewhere("INSERT INTO runs (project_name, kind, status, started_at, ended_at) "
+                      "VALUES (?, 'lint', 'done', 0, 0)", (project,))
+    assert db_handler.get_project(project) is cached
+
+def test_structure_saved_by_another_connection_is_reloaded(project):
+    assert len(db_handler.get_project(project).files) == 4
+    execute_elsewhere("UPDATE folder_structures SET folder_structure = ? WHERE project_name = ?",
+                      (json.dumps(synthetic_structure(project, 8)), project))
+    assert len(db_handler.get_project(project).files) == 8
+
+def test_project_created_by_another_connection_is_listed(project):
+    assert db_handler.get_project_names() == [project]
+    execute_elsewhere("INSERT INTO folder_structures (project_name, user_prompt, folder_structure) VALUES (?, ?, ?)",
+                      ("other", "", json.dumps(synthetic_structure("other", 1))))
+    assert sorted(db_handler.get_project_names()) == [project, "other"]
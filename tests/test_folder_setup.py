@@ -0,0 +1,26 @@
+import os
+from utils.benchmark import synthetic_structure
+from utils.folder_setup import apply_plan, describe_plan, plan_folders
+from utils.project_structure import ProjectStructure
+
+PROJECT = ProjectStructure.from_dict(synthetic_structure("demo", 20))
+
+def test_applied_plan_leaves_nothing_to_do(tmp_path):
+    plan = plan_folders(str(tmp_path), PROJECT)
+    assert len(describe_plan(plan)) == 1 + len(PROJECT.directories) + len(PROJECT.files)
+    assert apply_plan(plan) == []
+    assert all(os.path.isfile(path) for path in PROJECT.paths(plan["root"]))
+
+    again = plan_folders(str(tmp_path), PROJECT)
+    assert describe_plan(again) == []
+    assert apply_plan(again) == []
+
+def test_existing_files_are_not_truncated(tmp_path):
+    plan = plan_folders(str(tmp_path), PROJECT)
+    file_path = plan["files"][0]
+    os.makedirs(os.path.dirname(file_path))
+    with open(file_path, "w") as f:  # Written after planning, e.g. by a concurrent code generation run
+        f.write("module unit_0000; endmodule\n")
+    assert apply_plan(plan) == []
+    with open(file_path) as f:
+        assert f.read() == "module unit_0000; endmodule\n"
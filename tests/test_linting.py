@@ -0,0 +1,58 @@
+import os
+from utils.benchmark import install_fake_tools
+from utils.linting import PROJECT_LINT_KEY, init_db, lint_project, parse_diagnostics, split_diagnostics
+
+OUTPUT = """%Warning-UNUSED: {top}:2:12: Signal is not used: 'unused'
+    2 |   wire unused;
+      |        ^~~~~~
+%Error: {core}:7: syntax error, unexpected endmodule
+%Warning-MULTITOP: Multiple top level modules
+%Error: Exiting due to 1 error(s)
+"""
+
+def lint_files(tmp_path):
+    """Two files with the same name in different directories, as (relative path, path) pairs."""
+    return [(relative_path, str(tmp_path / relative_path)) for relative_path in ("src/top.v", "src/core/top.v")]
+
+def test_parse_diagnostics():
+    output = OUTPUT.format(top="src/top.v", core="src/core/top.v")
+    assert parse_diagnostics(output) == [
+        (2, 12, "warning", "UNUSED", "Signal is not used: 'unused'"),
+        (7, None, "error", "", "syntax error, unexpected endmodule"),
+        (None, None, "warning", "MULTITOP", "Multiple top level modules"),
+    ]
+
+def test_parse_diagnostics_of_clean_output():
+    assert parse_diagnostics("") == []
+
+def test_split_diagnostics_groups_output_by_file(tmp_path):
+    files = lint_files(tmp_path)
+    output = OUTPUT.format(top=files[0][1], core=files[1][1])
+    results = dict(split_diagnostics(output, files))
+    assert results["src/top.v"].splitlines()[0].startswith("%Warning-UNUSED")
+    assert len(results["src/top.v"].splitlines()) == 3  # Source excerpt lines stay with their diagnostic
+    assert results["src/core/top.v"].startswith("%Error: ")
+    assert results[PROJECT_LINT_KEY] == "%Warning-MULTITOP: Multiple top level modules\n"
+    assert "Exiting due to" not in "".join(results.values())
+
+def test_split_diagnostics_matches_relative_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    files = lint_files(tmp_path)
+    output = OUTPUT.format(top=os.path.join("src", "top.v"), core=os.path.join("src", "core", "top.v"))
+    results = dict(split_diagnostics(output, files))
+    assert "UNUSED" in results["src/top.v"] and "syntax error" in results["src/core/top.v"]
+
+def test_split_diagnostics_lists_clean_files(tmp_path):
+    assert split_diagnostics("", lint_files(tmp_path)) == [("src/top.v", ""), ("src/core/top.v", "")]
+
+def test_lint_cache_keeps_each_file_path(project, tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", os.environ["PATH"])
+    install_fake_tools(str(tmp_path / "bin"))
+    folder = tmp_path / "demo"
+    (folder / "rtl_00").mkdir(parents=True)
+    for index in range(4):  # Identical content, so only the path tells the cache entries apart
+        (folder / "rtl_00" / f"unit_{index:04d}.v").write_text("module unit (input wire unused);\nendmodule\n")
+    conn, c = init_db()
+    lint_project(c, conn, project, str(folder))
+    for relative_path, lint_output in lint_project(c, conn, project, str(folder)):
+        assert os.path.join(str(folder), relative_path) in lint_output
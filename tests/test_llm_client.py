@@ -0,0 +1,156 @@
+import time
+import pytest
+from types import SimpleNamespace
+from utils import llm_client
+from utils.benchmark import FakeClient, FakeModels
+from utils.llm_client import CircuitBreaker, CircuitOpenError, ResilientModels, TokenBucket, is_retryable
+
+class APIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class FlakyModels(FakeModels):
+    """FakeModels that raises the queued errors before answering; stream errors can come after `chunks_first`."""
+
+    def __init__(self, errors, chunks_first=0):
+        super().__init__(0)
+        self.errors = list(errors)
+        self.chunks_first = chunks_first
+        self.attempts = 0
+
+    def generate_content(self, model, contents, **kwargs):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().generate_content(model, contents)
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        self.attempts += 1
+        chunks = list(super().generate_content_stream(model, contents))
+        if self.errors:
+            yield from chunks[:self.chunks_first]
+            raise self.errors.pop(0)
+        yield from chunks
+
+def resilient(models, **options):
+    sleeps = []
+    wrapped = ResilientModels(models, TokenBucket(0), options.pop("breaker", CircuitBreaker()),
+                              sleep=sleeps.append, **options)
+    return wrapped, sleeps
+
+def test_retries_transient_errors_then_succeeds():
+    models = FlakyModels([ConnectionError(), APIError(503)])
+    wrapped, sleeps = resilient(models)
+    response = wrapped.generate_content(model="m", contents="**File Path:** src/alu.v")
+    assert "module alu" in response.text
+    assert models.attempts == 3
+    assert len(sleeps) == 2
+
+def test_non_retryable_error_is_raised_at_once():
+    models = FlakyModels([APIError(400)])
+    wrapped, sleeps = resilient(models)
+    with pytest.raises(APIError):
+        wrapped.generate_content(model="m", contents="")
+    assert models.attempts == 1
+    assert sleeps == []
+
+def test_gives_up_after_max_retries():
+    models = FlakyModels([ConnectionError()] * 10)
+    wrapped, sleeps = resilient(models, max_retries=3)
+    with pytest.raises(ConnectionError):
+        wrapped.generate_content(model="m", contents="")
+    assert models.attempts == 4
+    assert len(sleeps) == 3
+
+def test_backoff_uses_full_jitter_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+    models = FlakyModels([ConnectionError()] * 4)
+    wrapped, sleeps = resilient(models, backoff_base=1.0, backoff_max=3.0)
+    wrapped.generate_content(model="m", contents="")
+    assert sleeps == [1.0, 2.0, 3.0, 3.0]
+
+def test_deadline_stops_retrying(monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+    models = FlakyModels([ConnectionError()] * 3)
+    wrapped, sleeps = resilient(models, deadline=0.5, backoff_base=1.0)
+    with pytest.raises(ConnectionError):
+        wrapped.generate_content(model="m", contents="")
+    assert models.attempts == 1
+
+def test_quota_errors_pause_the_shared_bucket(monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: 0.05)
+    bucket = TokenBucket(1000)
+    wrapped = ResilientModels(FlakyModels([APIError(429)]), bucket, CircuitBreaker(), sleep=lambda delay: None)
+    before = time.monotonic()
+    wrapped.generate_content(model="m", contents="")
+    assert bucket.paused_until >= before + 0.05
+    assert time.monotonic() >= before + 0.05  # The retry itself waited for the bucket
+
+def test_client_bucket_allows_a_minute_of_requests_in_a_burst():
+    bucket = llm_client.ResilientClient(FakeClient(0), requests_per_minute=120).bucket
+    before = time.monotonic()
+    for _ in range(120):
+        bucket.acquire()
+    assert time.monotonic() - before < 0.1
+
+def test_unlimited_bucket_still_waits_out_a_pause():
+    bucket = TokenBucket(0)
+    bucket.pause(0.05)
+    before = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() >= before + 0.04
+
+def test_circuit_opens_after_repeated_failures_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    models = FlakyModels([ConnectionError()] * 10)
+    wrapped, _ = resilient(models, breaker=breaker, max_retries=5)
+    with pytest.raises(CircuitOpenError):
+        wrapped.generate_content(model="m", contents="")
+    assert models.attempts == 2
+    with pytest.raises(CircuitOpenError):
+        wrapped.generate_content(model="m", contents="")
+    assert models.attempts == 2
+
+def test_circuit_lets_one_trial_call_through_after_the_cooldown():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    breaker.before_call()  # The trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+
+def test_stream_is_retried_before_the_first_chunk():
+    models = FlakyModels([ConnectionError()])
+    wrapped, sleeps = resilient(models)
+    text = "".join(chunk.text for chunk in wrapped.generate_content_stream(model="m", contents=""))
+    assert "module bench" in text
+    assert models.attempts == 2
+    assert len(sleeps) == 1
+
+def test_stream_is_not_retried_after_a_chunk_was_yielded():
+    models = FlakyModels([ConnectionError()], chunks_first=1)
+    wrapped, sleeps = resilient(models)
+    received = []
+    with pytest.raises(ConnectionError):
+        for chunk in wrapped.generate_content_stream(model="m", contents=""):
+            received.append(chunk.text)
+    assert len(received) == 1
+    assert models.attempts == 1
+    assert sleeps == []
+
+@pytest.mark.parametrize("error, retryable", [
+    (ConnectionError(), True),
+    (TimeoutError(), True),
+    (APIError(429), True),
+    (APIError(503), True),
+    (APIError(400), False),
+    (ValueError("bad prompt"), False),
+    (SimpleNamespace(status_code=502), True),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
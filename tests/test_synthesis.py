@@ -0,0 +1,53 @@
+import os
+import json
+import pytest
+from utils import db_handler
+from utils.benchmark import install_fake_tools
+from utils.synthesis import iter_synthesis, load_synthesis_manifest
+
+MODULE = "module top (input wire a, output wire y);\n  assign y = a;\nendmodule\n"
+
+@pytest.fixture
+def tools(tmp_path, monkeypatch):
+    """Fake Yosys and netlistsvg first on PATH for the length of the test."""
+    monkeypatch.setenv("PATH", os.environ["PATH"])
+    install_fake_tools(str(tmp_path / "bin"))
+
+def save_project(name, directories):
+    db_handler.save_project_structure(name, "Test project", json.dumps(
+        {"project_name": name, "directories": directories, "metadata": {}}))
+
+def write_files(folder, relative_paths):
+    for relative_path in relative_paths:
+        os.makedirs(os.path.dirname(os.path.join(folder, relative_path)), exist_ok=True)
+        with open(os.path.join(folder, relative_path), "w") as f:
+            f.write(MODULE)
+
+def test_files_with_the_same_name_get_separate_artifacts(database, tools, tmp_path):
+    save_project("dup", [{"name": "src", "files": ["top.v"],
+                          "subdirectories": [{"name": "core", "files": ["top.v"], "subdirectories": []}]}])
+    folder = str(tmp_path / "dup")
+    write_files(folder, ["src/top.v", "src/core/top.v"])
+    results = {name: (image, error) for name, image, error, _ in iter_synthesis(folder, "dup")}
+    assert sorted(results) == ["src__core__top", "src__top"]
+    assert all(error is None and os.path.exists(image) for image, error in results.values())
+
+def test_unchanged_files_are_not_synthesized_again(project, tools, tmp_path):
+    folder = str(tmp_path / project)
+    write_files(folder, [os.path.join("rtl_00", f"unit_{index:04d}.v") for index in range(4)])
+    assert not any(cached for *_, cached in iter_synthesis(folder, project))
+    assert all(cached for *_, cached in iter_synthesis(folder, project))
+
+    with open(os.path.join(folder, "rtl_00", "unit_0002.v"), "a") as f:
+        f.write("// edited\n")
+    rebuilt = [name for name, _, _, cached in iter_synthesis(folder, project) if not cached]
+    assert rebuilt == ["unit_0002"]
+    assert all(cached for *_, cached in iter_synthesis(folder, project))
+
+def test_manifest_is_saved_as_each_job_finishes(project, tools, tmp_path):
+    folder = str(tmp_path / project)
+    write_files(folder, [os.path.join("rtl_00", f"unit_{index:04d}.v") for index in range(4)])
+    results = iter_synthesis(folder, project)
+    name, *_ = next(results)
+    assert name in load_synthesis_manifest(os.path.join(folder, "synthesized_images"))
+    results.close()
@@ -0,0 +1,22 @@
+from utils import tracing
+from utils.tracing import Run, list_runs, save_run, span, tool_percentiles, trace_run
+
+def test_only_the_latest_runs_of_a_project_are_kept(database, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_RUNS_KEPT", 3)
+    for _ in range(5):
+        with trace_run("demo", "lint"):
+            with span("subprocess", "verilator"):
+                pass
+    save_run(Run("other", "lint"), "done")
+    runs = list_runs("demo")
+    assert len(runs) == 3 and all(run["spans"] == 1 for run in runs)
+    assert len(list_runs("other")) == 1
+    assert tool_percentiles("demo")[0]["count"] == 3
+
+def test_percentiles_cover_only_recent_runs(database):
+    for _ in range(4):
+        with trace_run("demo", "lint"):
+            with span("subprocess", "verilator"):
+                pass
+    assert tool_percentiles("demo", runs=2)[0]["count"] == 2
+    assert tool_percentiles(runs=10)[0]["count"] == 4
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.db_handler import get_project_names
+from utils.tracing import bind_context, trace_run
+
+STAGES = ("structure", "generate", "lint", "synthesize", "pipeline")
+
+def summarize_lint(results):
+    from utils.linting import parse_diagnostics
+    severities = [diagnostic[2] for _, lint_output in results for diagnostic in parse_diagnostics(lint_output)]
+    return {"files": len(results), "with_issues": sum(1 for _, lint_output in results if lint_output),
+            "errors": severities.count("error"), "warnings": severities.count("warning")}
+
+def run_stage(stage, item, base_path=".", per_project_jobs=1, **options):
+    """Run one stage for one project (or, for `structure`, one description) and return a JSON-ready summary."""
+    if stage == "structure":
+        from utils.folder_structure_generation import generate_rtl_structure
+        structure = json.loads(generate_rtl_structure(item, use_cache=options.get("use_cache", True)))
+        # enforce_json_structure turns an unusable response into an unnamed project without directories
+        if not structure.get("directories") or structure.get("project_name", "Unnamed Project") == "Unnamed Project":
+            raise ValueError("The model did not return a valid structure.")
+        return {"project_name": structure["project_name"]}
+
+    project_root = os.path.join(base_path, item)
+    if stage == "generate":
+        from utils.code_generator import generate_code
+        result = generate_code(item, project_root, max_workers=per_project_jobs, **options)
+        return {"generated": len(result["generated"]), "skipped": len(result["skipped"]),
+                "removed": len(result["removed"]), "prompt_tokens": sum(result["prompt_tokens"].values())}
+
+    if stage == "lint":
+        from utils.linting import run_linting
+        results = run_linting(item, project_root, jobs=per_project_jobs, **options)
+        if isinstance(results, str):
+            raise ValueError(results)
+        return summarize_lint(results)
+
+    if stage == "synthesize":
+        from utils.synthesis import run_synthesis
+        results = run_synthesis(project_root, item, max_workers=per_project_jobs, **options)
+        if isinstance(results, str):
+            raise ValueError(results)
+        success_files, error_logs = results
+        return {"built": len(success_files), "failed": len(error_logs), "errors": error_logs}
+
+    from utils.pipeline import run_pipeline
+    summary = run_pipeline(item, base_path, codegen_workers=per_project_jobs, lint_jobs=per_project_jobs,
+                           synthesis_jobs=per_project_jobs, **options)
+    statuses = [status for stages in summary["files"].values() for status in stages.values()]
+    return {"files": len(summary["files"]), "failed": sum(1 for status in statuses if status.startswith("error")),
+            "code_generation": summary["code_generation"]}
+
+def run_batch(stage, items, base_path=".", jobs=4, per_project_jobs=1, progress_callback=None, **options):
+    """Run a stage over many projects (or descriptions, for `structure`) with a global concurrency limit.
+
+    Up to `jobs` projects run at once and each uses up to `per_project_jobs`
+    workers, so at most jobs * per_project_jobs LLM requests or tool processes
+    are in flight. Everything is traced as a single run. `progress_callback(item,
+    status)` is called from the calling thread as projects finish.
+
+    Returns {"stage", "jobs", "wall_time_s", "succeeded", "failed", "projects"},
+    with one {"project", "status", "duration_s", "result" or "error"} entry per item.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def run_one(item):
+        started = time.perf_counter()
+        try:
+            entry = {"status": "done", "result": run_stage(stage, item, base_path, per_project_jobs, **options)}
+        except Exception as e:
+            entry = {"status": "failed", "error": str(e)}
+        return {"project": item, **entry, "duration_s": round(time.perf_counter() - started, 3)}
+
+    started = time.perf_counter()
+    projects = []
+    with trace_run(None, f"batch {stage}"), ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        for future in as_completed([executor.submit(bind_context(run_one), item) for item in items]):
+            projects.append(future.result())
+            if progress_callback:
+                progress_callback(projects[-1]["project"], projects[-1]["status"])
+
+    order = {item: index for index, item in enumerate(items)}
+    projects.sort(key=lambda entry: order[entry["project"]])
+    return {"stage": stage, "jobs": jobs, "wall_time_s": round(time.perf_counter() - started, 3),
+            "succeeded": sum(1 for entry in projects if entry["status"] == "done"),
+            "failed": sum(1 for entry in projects if entry["status"] == "failed"), "projects": projects}
+
+def stage_options(args):
+    """Keyword arguments of the stage function taken from the command line."""
+    options = {}
+    if args.stage in ("structure", "generate") and args.no_cache:
+        options["use_cache"] = False
+    if args.stage == "generate" and args.force:
+        options["force"] = True
+    if args.stage in ("lint", "synthesize") and args.mode:
+        options["mode"] = {"lint": {"file": "file", "project": "project"},
+                           "synthesize": {"file": "file", "project": "hierarchical"}}[args.stage][args.mode]
+    if args.stage == "synthesize" and args.force:
+        options["force"] = True
+    return options
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run RTL project stages headlessly over many projects.")
+    parser.add_argument("stage", choices=STAGES)
+    parser.add_argument("projects", nargs="*", help="stored project names, or project descriptions for `structure`")
+    parser.add_argument("--all", action="store_true", help="every stored project")
+    parser.add_argument("--from-file", help="read project names (or descriptions) from a file, one per line")
+    parser.add_argument("--path", default=".", help="base directory holding the project folders")
+    parser.add_argument("--jobs", type=int, default=4, help="projects processed at the same time")
+    parser.add_argument("--per-project-jobs", type=int, default=1,
+                        help="LLM requests or tool processes per project (total stays under jobs x this)")
+    parser.add_argument("--mode", choices=("file", "project"), help="lint/synthesize per file or whole project")
+    parser.add_argument("--force", action="store_true", help="regenerate or resynthesize everything")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the LLM response cache")
+    args = parser.parse_args(argv)
+
+    items = list(args.projects)
+    if args.from_file:
+        with open(args.from_file) as f:
+            items += [line.strip() for line in f if line.strip()]
+    if args.all:
+        if args.stage == "structure":
+            parser.error("--all cannot be used with the structure stage")
+        items += [name for name in get_project_names() if name not in items]
+    if not items:
+        parser.error("no projects given (name them, or use --all or --from-file)")
+
+    summary = run_batch(args.stage, items, args.path, args.jobs, args.per_project_jobs,
+                        progress_callback=lambda item, status: print(f"{status:<7} {item}", file=sys.stderr),
+                        **stage_options(args))
+    print(json.dumps(summary, indent=4))
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+from types import SimpleNamespace
+from utils import db_handler, llm_cache
+from utils.llm_client import ResilientClient
+
+# Fake EDA tools: tiny Python scripts put first on PATH. They sleep for BENCH_TOOL_LATENCY
+# seconds and write the same files as the real tools, so lint and synthesis run unchanged.
+FAKE_TOOLS = {
+    "verilator": '''
+import os, sys, time
+time.sleep(float(os.environ.get("BENCH_TOOL_LATENCY", "0")))
+files = [arg for arg in sys.argv[1:] if arg.endswith((".v", ".sv"))]
+for path in files:
+    sys.stderr.write(f"%Warning-UNUSED: {path}:2:12: Signal is not used: 'unused'\\n")
+if files:
+    sys.stderr.write(f"%Error: Exiting due to {len(files)} warning(s)\\n")
+    sys.exit(1)
+''',
+    "yosys": '''
+import os, sys, time
+if sys.argv[1:] == ["-V"]:
+    print("Yosys 0.0 (benchmark stub)")
+    sys.exit(0)
+time.sleep(float(os.environ.get("BENCH_TOOL_LATENCY", "0")))
+for command in sys.argv[sys.argv.index("-p") + 1].split(";"):
+    words = command.split()
+    if words and words[0] == "write_json":
+        with open(words[-1], "w") as netlist:
+            netlist.write('{"modules": {}}')
+print("End of script.")
+''',
+    "netlistsvg": '''
+import os, sys, time
+if sys.argv[1:] == ["--version"]:
+    print("netlistsvg 0.0 (benchmark stub)")
+    sys.exit(0)
+time.sleep(float(os.environ.get("BENCH_TOOL_LATENCY", "0")))
+with open(sys.argv[sys.argv.index("-o") + 1], "w") as image:
+    image.write("<svg xmlns='http://www.w3.org/2000/svg'/>")
+''',
+}
+
+FILE_PATH_RE = re.compile(r"\*\*File Path:\*\* (\S+)")
+FILES_PER_DIRECTORY = 50
+TESTBENCH_SHARE = 10  # One file in this many is a testbench
+
+class FakeModels:
+    """Stands in for `genai.Client().models`: waits `latency` seconds, then returns a small module."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def respond(self, contents):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        match = FILE_PATH_RE.search(contents)
+        name = os.path.splitext(os.path.basename(match.group(1)))[0] if match else "bench"
+        return f"```verilog\nmodule {name} (input wire a, input wire unused, output wire y);\n  assign y = a;\nendmodule\n```"
+
+    def generate_content(self, model, contents, **kwargs):
+        return SimpleNamespace(text=self.respond(contents))
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        text = self.respond(contents)
+        for start in range(0, len(text), 64):
+            yield SimpleNamespace(text=text[start:start + 64])
+
+class FakeClient:
+    def __init__(self, latency):
+        self.models = FakeModels(latency)
+
+def install_fake_tools(bin_dir):
+    """Write the fake tools to `bin_dir` and put it first on PATH."""
+    os.makedirs(bin_dir, exist_ok=True)
+    for name, source in FAKE_TOOLS.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as script:
+            script.write(f"#!{sys.executable}\n{source}")
+        os.chmod(path, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+
+def synthetic_structure(project_name, file_count):
+    """A folder structure in the stored schema with `file_count` Verilog files, some of them testbenches."""
+    testbenches = file_count // TESTBENCH_SHARE
+    design_files = [f"unit_{index:04d}.v" for index in range(file_count - testbenches)]
+    directories = [{"name": f"rtl_{start // FILES_PER_DIRECTORY:02d}",
+                    "files": design_files[start:start + FILES_PER_DIRECTORY], "subdirectories": []}
+                   for start in range(0, len(design_files), FILES_PER_DIRECTORY)]
+    if testbenches:
+        directories.append({"name": "tb", "files": [f"unit_{index:04d}_tb.sv" for index in range(testbenches)],
+                            "subdirectories": []})
+    return {"project_name": project_name, "directories": directories,
+            "metadata": {"generated_by": "benchmark", "version": "1.0"}}
+
+class DatabaseCounter:
+    """Counts the SQL statements run on every SQLite connection opened while it is active."""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.connect = sqlite3.connect
+
+    def trace(self, statement):
+        is_read = statement.lstrip().upper().startswith(("SELECT", "PRAGMA"))
+        with self.lock:
+            if is_read:
+                self.reads += 1
+            else:
+                self.writes += 1
+
+    def counting_connect(self, *args, **kwargs):
+        conn = self.connect(*args, **kwargs)
+        conn.set_trace_callback(self.trace)
+        return conn
+
+    def __enter__(self):
+        sqlite3.connect = self.counting_connect
+        return self
+
+    def __exit__(self, *exc_info):
+        sqlite3.connect = self.connect
+
+def reset_peak_memory():
+    """Reset the kernel's peak RSS counter (VmHWM) for this process; Linux only, best effort."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_memory_mb(reset_supported):
+    if reset_supported:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def database_size(paths):
+    return sum(os.path.getsize(path + suffix) for path in paths for suffix in ("", "-wal")
+               if os.path.exists(path + suffix))
+
+def measure(stage, file_count, function, db_paths, counter):
+    """Run one stage and return its wall time, throughput, peak memory and database activity."""
+    reads, writes = counter.reads, counter.writes
+    size = database_size(db_paths)
+    reset_supported = reset_peak_memory()
+    started = time.perf_counter()
+    function()
+    wall_time = time.perf_counter() - started
+    return {
+        "stage": stage,
+        "files": file_count,
+        "wall_time_s": round(wall_time, 4),
+        "files_per_s": round(file_count / wall_time, 2) if wall_time else None,
+        "peak_rss_mb": round(peak_memory_mb(reset_supported), 1),
+        "db_reads": counter.reads - reads,
+        "db_writes": counter.writes - writes,
+        "db_growth_bytes": database_size(db_paths) - size,
+    }
+
+def benchmark_size(root, file_count, llm_latency, codegen_workers, jobs, counter):
+    """Benchmark code generation, lint and synthesis on a fresh synthetic project, cold then warm."""
+    from utils.code_generator import generate_code
+    from utils.linting import run_linting
+    from utils.synthesis import run_synthesis
+
+    work_dir = os.path.join(root, f"files_{file_count}")
+    db_handler.DB_NAME = os.path.join(work_dir, "database", "folder_structure.db")
+    llm_cache.CACHE_DB = os.path.join(work_dir, "database", "llm_cache.db")
+    db_paths = [db_handler.DB_NAME, llm_cache.CACHE_DB]
+    project_name = f"benchmark_{file_count}"
+    project_location = os.path.join(work_dir, project_name)
+    db_handler.save_project_structure(project_name, "Synthetic benchmark project",
+                                      json.dumps(synthetic_structure(project_name, file_count)))
+
+    llm_client = ResilientClient(FakeClient(llm_latency), requests_per_minute=None)
+    stages = {
+        "generate_code": lambda: generate_code(project_name, project_location, max_workers=codegen_workers,
+                                               llm_client=llm_client),
+        "lint_project": lambda: run_linting(project_name, project_location, jobs=jobs),
+        "run_synthesis": lambda: run_synthesis(project_location, project_name, max_workers=jobs),
+    }
+    results = []
+    for run in ("cold", "warm"):  # The warm run is answered by the manifests and caches
+        for stage, function in stages.items():
+            result = measure(stage, file_count, function, db_paths, counter)
+            result["run"] = run
+            results.append(result)
+    results.append({"stage": "llm_requests", "files": file_count, "calls": llm_client.client.models.calls})
+    db_handler.close_connection()
+    db_handler.close_connection(llm_cache.CACHE_DB)
+    return results
+
+def run_benchmark(sizes=(10, 100, 1000), llm_latency=0.05, tool_latency=0.01, codegen_workers=8, jobs=None,
+                  work_dir=None):
+    """Benchmark every stage on synthetic projects of each size, offline, with fake LLM and EDA tools.
+
+    Everything (projects, databases, caches) lives in a temporary directory
+    unless `work_dir` is given, so the real database is never touched.
+    Returns a JSON-serializable report.
+    """
+    saved = db_handler.DB_NAME, llm_cache.CACHE_DB, os.environ.get("PATH", "")
+    with tempfile.TemporaryDirectory(prefix="rtl_benchmark_") as temp_dir:
+        root = work_dir or temp_dir
+        install_fake_tools(os.path.join(root, "bin"))
+        os.environ["BENCH_TOOL_LATENCY"] = str(tool_latency)
+        try:
+            with DatabaseCounter() as counter:
+                results = [result for size in sizes
+                           for result in benchmark_size(root, size, llm_latency, codegen_workers, jobs, counter)]
+        finally:
+            db_handler.DB_NAME, llm_cache.CACHE_DB, os.environ["PATH"] = saved
+            db_handler.invalidate_cache()
+
+    return {
+        "config": {"sizes": list(sizes), "llm_latency_s": llm_latency, "tool_latency_s": tool_latency,
+                   "codegen_workers": codegen_workers, "jobs": jobs or os.cpu_count()},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+
+def compare_reports(report, baseline):
+    """Wall time change per stage, run and size against an earlier report, as {label: percent}."""
+    previous = {(result["stage"], result.get("run"), result["files"]): result["wall_time_s"]
+                for result in baseline["results"] if "wall_time_s" in result}
+    changes = {}
+    for result in report["results"]:
+        key = (result["stage"], result.get("run"), result["files"])
+        if key in previous and previous[key]:
+            changes["{} {} {}".format(*key)] = round((result["wall_time_s"] / previous[key] - 1) * 100, 1)
+    return changes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark code generation, linting and synthesis offline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="files per synthetic project")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM response")
+    parser.add_argument("--tool-latency", type=float, default=0.01, help="seconds per fake Verilator/Yosys run")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent code generation requests")
+    parser.add_argument("--jobs", type=int, help="parallel lint and synthesis runs (default: CPU count)")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="earlier JSON report to compare wall times against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.llm_latency, args.tool_latency, args.workers, args.jobs)
+    if args.compare:
+        with open(args.compare) as baseline:
+            report["comparison"] = compare_reports(report, json.load(baseline))
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=4)
+
+    print(f"{'stage':<15} {'run':<5} {'files':>6} {'wall s':>9} {'files/s':>9} {'peak MB':>8} {'db r/w':>13}")
+    for result in report["results"]:
+        if "wall_time_s" in result:
+            print(f"{result['stage']:<15} {result['run']:<5} {result['files']:>6} {result['wall_time_s']:>9.3f} "
+                  f"{result['files_per_s'] or 0:>9.1f} {result['peak_rss_mb']:>8.1f} "
+                  f"{result['db_reads']:>6}/{result['db_writes']:<6}")
+    for label, change in report.get("comparison", {}).items():
+        print(f"{label}: {change:+.1f}% wall time")
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,392 @@
 import os
-import sqlite3
 import json
 import re
-from dotenv import load_dotenv
-from google import genai
-
-# Load API key from .env file
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=API_KEY)
-
-# Initialize SQLite connection
-def get_db_connection():
-    return sqlite3.connect("database/folder_structure.db", check_same_thread=False)
-
-def get_available_projects():
-    """Fetch available project names from the database."""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT project_name FROM folder_structures")
-    projects = [row[0] for row in c.fetchall()]
-    conn.close()
-    return projects
-
-def get_project_details(project_name):
-    """Retrieve project folder structure from the database."""
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT folder_structure FROM folder_structures WHERE project_name = ?", (project_name,))
-    row = c.fetchone()
-    conn.close()
-    return json.loads(row[0]) if row else {}
+import queue
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from utils.db_handler import get_project
+from utils.llm_cache import generate_text, stream_text
+from utils.llm_client import TokenBucket, get_client
+from utils.manifest import (file_prompt_hash, hash_text, load_manifest, needs_generation, record_file,
+                            remove_stale_files, save_manifest)
+from utils.project_structure import TESTBENCH_NAME_RE
+from utils.synthesis import COMMENT_RE
+from utils.tracing import bind_context, traced
+
+MODEL_NAME = "gemini-2.0-flash"
+
+MODULE_HEADER_RE = re.compile(r"\bmodule\s+\w+\s*(?:#\s*\(.*?\)\s*)?(?:\(.*?\))?\s*;", re.S)
+PORT_DECLARATION_RE = re.compile(r"^\s*(?:input|output|inout)\b[^;]*;", re.M)
+# One file of a batched response: "===== FILE: <path> =====" ... "===== END FILE ====="
+FILE_BLOCK_RE = re.compile(r"^=====\s*FILE:\s*(.+?)\s*=====[ \t]*\n(.*?)^=====\s*END FILE\s*=====", re.M | re.S)
+MAX_BATCH_SIZE = 8  # Files per batched request
 
 def clean_code(response_text):
     """Remove unwanted markdown and language specifiers from Gemini response."""
     return re.sub(r'```[a-zA-Z]*', '', response_text).strip()
 
-def generate_code_for_file(project_name, project_description, folder_structure, file_path):
-    """Generate code for a given file using Gemini API."""
-    prompt = f'''
+class FenceStripper:
+    """Streaming counterpart of clean_code: drops markdown fences as chunks arrive.
+
+    A possible partial fence at the end of a chunk is held back until the
+    next chunk shows whether it is one, and trailing whitespace is held back
+    so the concatenated output equals clean_code() of the whole response.
+    """
+
+    def __init__(self):
+        self.pending = ""
+        self.trailing = ""
+        self.started = False
+
+    def feed(self, text):
+        self.pending += text
+        partial = re.search(r'`+[a-zA-Z]*$', self.pending)
+        cut = partial.start() if partial else len(self.pending)
+        ready, self.pending = self.pending[:cut], self.pending[cut:]
+        return self.emit(re.sub(r'```[a-zA-Z]*', '', ready))
+
+    def finish(self):
+        ready, self.pending = self.pending, ""
+        return self.emit(re.sub(r'```[a-zA-Z]*', '', ready))
+
+    def emit(self, text):
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self.started = True
+        text = self.trailing + text
+        body = text.rstrip()
+        self.trailing = text[len(body):]
+        return body
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for prompt size reporting."""
+    return (len(text) + 3) // 4
+
+def summarize_structure(project):
+    """Minified {directory path: [files]} map of a ProjectStructure, without metadata."""
+    return json.dumps({directory.path: list(directory.files) for directory in project.directories},
+                      separators=(",", ":"))
+
+def extract_interface(source):
+    """Module headers and port declarations of a Verilog source, whitespace-collapsed."""
+    source = COMMENT_RE.sub("", source)
+    # Non-ANSI modules declare their ports in the body, after the header
+    parts = MODULE_HEADER_RE.findall(source) + PORT_DECLARATION_RE.findall(MODULE_HEADER_RE.sub("", source))
+    return " ".join(" ".join(part.split()) for part in parts)
+
+def build_prompt_context(project, project_location=None, exclude=()):
+    """Prompt context shared by every file of one run.
+
+    Holds the compact structure summary and the interfaces of the Verilog
+    files that already exist in `project_location`, read once up front so
+    all prompts of the run are built from the same snapshot. Files in
+    `exclude` (relative paths, the files this run regenerates) are left out,
+    as their current content is about to be replaced; a forced re-run of a
+    project thus rebuilds the prompts of the run that generated it.
+    """
+    interfaces = {}
+    if project_location:
+        for file in project.files_of("rtl", "testbench"):
+            if file.path in exclude:
+                continue
+            try:
+                with open(os.path.join(project_location, file.path)) as f:
+                    source = f.read()
+            except FileNotFoundError:
+                continue
+            interface = extract_interface(source)
+            if interface:
+                interfaces[file.path] = interface
+    return {"root": project_location, "summary": summarize_structure(project), "interfaces": interfaces}
+
+def related_interfaces(context, file_path):
+    """Interfaces of files in the same directory or sharing a name stem (e.g. a module and its testbench)."""
+    if not context["root"]:
+        return {}
+    relative_path = os.path.relpath(file_path, context["root"])
+    directory, stem = os.path.dirname(relative_path), os.path.splitext(os.path.basename(relative_path))[0].lower()
+    related = {}
+    for other, interface in context["interfaces"].items():
+        other_stem = os.path.splitext(os.path.basename(other))[0].lower()
+        if other != relative_path and (os.path.dirname(other) == directory or other_stem in stem or stem in other_stem):
+            related[other] = interface
+    return related
+
+def build_code_prompt(project_name, project_description, project, file_path, context=None):
+    context = context or build_prompt_context(project)
+    interfaces = "".join(f"\n    - {path}: {interface}"
+                         for path, interface in sorted(related_interfaces(context, file_path).items()))
+    return f'''
     Generate a complete code file based on the following details:
     
     **Project Name:** {project_name}
     **Project Description:** {project_description}
-    **Folder Structure:** {json.dumps(folder_structure, indent=4)}
+    **Folder Structure:** {context["summary"]}
+    **Related Interfaces:** {interfaces or "none"}
     **File Path:** {file_path}
     
     Provide the full code without explanations or additional text.
     Only provide the code for the file path which is mentioned.
     Do not include the code which will be mentioned in the other files.
     '''
-    
-    response = client.models.generate_content(model="gemini-2.0-flash", contents=prompt)
-    return clean_code(response.text)
 
-def generate_code(project_name, project_location):
-    """Generate and overwrite code files in the selected folder structure."""
-    folder_structure = get_project_details(project_name)
+def generate_code_for_file(project_name, project_description, project, file_path, llm_client=None,
+                           use_cache=True, context=None):
+    """Generate code for a given file using Gemini API."""
+    prompt = build_code_prompt(project_name, project_description, project, file_path, context)
+    response_text = generate_text(llm_client or get_client(), prompt, model=MODEL_NAME, use_cache=use_cache)
+    return clean_code(response_text)
+
+def stream_code_for_file(project_name, project_description, project, file_path, llm_client=None,
+                         use_cache=True, on_chunk=None, context=None):
+    """Stream generated code for a file to disk, as the model produces it.
+
+    Chunks go to `file_path + ".tmp"`, which replaces the file only once the
+    stream is complete; if the request fails the temporary file is removed
+    and the existing file is left as it was. `on_chunk(file_path, text,
+    chars)` is called with every cleaned chunk and the number of characters
+    written so far. Returns the complete code.
+    """
+    prompt = build_code_prompt(project_name, project_description, project, file_path, context)
+    stripper = FenceStripper()
+    written, chars = [], 0
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            for chunk in stream_text(llm_client or get_client(), prompt, model=MODEL_NAME, use_cache=use_cache):
+                text = stripper.feed(chunk)
+                if text:
+                    f.write(text)
+                    f.flush()
+                    written.append(text)
+                    chars += len(text)
+                    if on_chunk:
+                        on_chunk(file_path, text, chars)
+            text = stripper.finish()
+            f.write(text)
+            written.append(text)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return "".join(written)
+
+def group_files(file_paths, batch=None, max_batch_size=MAX_BATCH_SIZE, testbenches=()):
+    """Split files into request groups.
+
+    `batch="directory"` groups files of the same directory, `batch="module"`
+    groups a module with its testbenches: files listed in `testbenches` (as
+    classified by ProjectStructure) are keyed by their name stem without the
+    tb_/_tb/test_/_test affix, every other file by its plain stem. Without
+    `batch` every file is its own group.
+    """
+    if not batch:
+        return [[file_path] for file_path in file_paths]
+    groups = {}
+    for file_path in file_paths:
+        if batch == "directory":
+            key = os.path.dirname(file_path)
+        else:
+            key = os.path.splitext(os.path.basename(file_path))[0].lower()
+            if file_path in testbenches:
+                key = TESTBENCH_NAME_RE.sub("", key).strip("_") or key
+        groups.setdefault(key, []).append(file_path)
+    return [paths[start:start + max_batch_size]
+            for paths in groups.values() for start in range(0, len(paths), max_batch_size)]
+
+def build_batch_prompt(project_name, project_description, project, file_paths, context=None):
+    context = context or build_prompt_context(project)
+    related = {}
+    for file_path in file_paths:
+        related.update(related_interfaces(context, file_path))
+    interfaces = "".join(f"\n    - {path}: {interface}" for path, interface in sorted(related.items()))
+    file_list = "".join(f"\n    - {file_path}" for file_path in file_paths)
+    return f'''
+    Generate complete code files based on the following details:
+
+    **Project Name:** {project_name}
+    **Project Description:** {project_description}
+    **Folder Structure:** {context["summary"]}
+    **Related Interfaces:** {interfaces or "none"}
+    **File Paths:** {file_list}
+
+    Provide the full code of every listed file without explanations or additional text.
+    Only provide the code for the file paths which are mentioned.
+    Return each file in exactly this format, once per file, in the order listed:
+    ===== FILE: <file path> =====
+    <code>
+    ===== END FILE =====
+    '''
+
+def parse_batch_response(response_text, file_paths):
+    """Split a batched response into {file_path: code}.
+
+    Only blocks that name one of the requested files, appear once and hold
+    non-empty code are returned; anything else is left for a per-file retry.
+    """
+    blocks = {}
+    for name, code in FILE_BLOCK_RE.findall(response_text):
+        matches = [path for path in file_paths if path == name or path.endswith(os.sep + name.lstrip("./"))]
+        if len(matches) != 1:
+            continue
+        path = matches[0]
+        blocks[path] = None if path in blocks else clean_code(code)  # Duplicates are not trusted
+    return {path: code for path, code in blocks.items() if code}
+
+def generate_code_for_files(project_name, project_description, project, file_paths, llm_client=None,
+                            use_cache=True, context=None):
+    """Generate several files with one request, falling back to per-file requests.
+
+    Returns {file_path: code} for every file.
+    """
+    if len(file_paths) == 1:
+        return {file_paths[0]: generate_code_for_file(project_name, project_description, project,
+                                                      file_paths[0], llm_client, use_cache, context)}
+    prompt = build_batch_prompt(project_name, project_description, project, file_paths, context)
+    codes = parse_batch_response(generate_text(llm_client or get_client(), prompt, model=MODEL_NAME, use_cache=use_cache),
+                                 file_paths)
+    for file_path in file_paths:
+        if file_path not in codes:
+            codes[file_path] = generate_code_for_file(project_name, project_description, project,
+                                                      file_path, llm_client, use_cache, context)
+    return codes
+
+@traced("generate_code")
+def generate_code(project_name, project_location, max_workers=8, requests_per_minute=None,
+                  progress_callback=None, llm_client=None, use_cache=True, force=False, stream=False,
+                  stream_callback=None, batch=None, skip_callback=None):
+    """Generate code files for the selected folder structure, incrementally.
+
+    A manifest in the project folder records the structure hash and, per file,
+    the prompt hash, output hash and timestamp of the last generation. Only new
+    files, files whose prompt changed and files missing on disk are generated
+    (everything with `force=True`); files that left the structure are removed.
+    The manifest is saved atomically after every completed request, so an
+    interrupted run picks up where it stopped.
+
+    File prompts are sent concurrently on up to `max_workers` threads and each
+    file is written as soon as its response arrives. `progress_callback`, if
+    given, is called as `progress_callback(done, total, file_path, error)` from
+    the calling thread after every generated file, and `skip_callback(file_path)`
+    with every file that is up to date, before any request is sent. Responses
+    are served from the prompt cache unless `use_cache` is False.
+
+    With `stream=True` responses are streamed and written to their files
+    chunk by chunk; `stream_callback(file_path, text, chars)` then reports
+    every chunk, also from the calling thread.
+
+    With `batch="directory"` or `batch="module"` related files are generated
+    together in one request (see group_files); files missing from a batched
+    response are retried one by one. Batched requests are not streamed.
+
+    Prompts carry a compact structure summary and the interfaces of related
+    files that are not regenerated, built once per run with
+    build_prompt_context.
+
+    Returns a dict with a `message`, the relative paths that were
+    `generated`, `skipped` and `removed`, and the estimated `prompt_tokens`
+    of each request.
+    """
+    project = get_project(project_name)
     project_description = "Provide a detailed description of the project here..."  # Modify as needed
     
-    if not folder_structure:
+    if not project:
         raise ValueError("No folder structure found for the selected project.")
     
-    for directory in folder_structure.get("directories", []):
-        dir_path = os.path.join(project_location, directory["name"])
-        os.makedirs(dir_path, exist_ok=True)
-        
-        for file_name in directory.get("files", []):
-            file_path = os.path.join(dir_path, file_name)
-            code = generate_code_for_file(project_name, project_description, folder_structure, file_path)
-            
+    for directory in project.directories:
+        os.makedirs(os.path.join(project_location, directory.path), exist_ok=True)
+    file_paths = project.paths(project_location)
+
+    manifest = load_manifest(project_location)
+    prompt_hashes = {}
+    pending, skipped = [], []
+    for file_path in file_paths:
+        relative_path = os.path.relpath(file_path, project_location)
+        prompt_hashes[file_path] = file_prompt_hash(MODEL_NAME, project_name, project_description, relative_path)
+        if force or needs_generation(manifest, project_location, relative_path, prompt_hashes[file_path]):
+            pending.append(file_path)
+        else:
+            skipped.append(relative_path)
+            if skip_callback:
+                skip_callback(file_path)
+
+    removed = remove_stale_files(manifest, project_location,
+                                 [os.path.relpath(path, project_location) for path in file_paths])
+    manifest["structure_hash"] = project.hash
+
+    context = build_prompt_context(project, project_location,
+                                   {os.path.relpath(file_path, project_location) for file_path in pending})
+    groups = group_files(pending, batch, testbenches=set(project.paths(project_location, "testbench")))
+    prompt_tokens = {}
+    for group in groups:
+        if len(group) == 1:
+            prompt = build_code_prompt(project_name, project_description, project, group[0], context)
+        else:
+            prompt = build_batch_prompt(project_name, project_description, project, group, context)
+        prompt_tokens[", ".join(os.path.relpath(path, project_location) for path in group)] = estimate_tokens(prompt)
+
+    limiter = TokenBucket(requests_per_minute / 60.0 if requests_per_minute else 0)  # On top of the client's own limit
+
+    chunks = queue.Queue()  # Streamed chunks, handed to stream_callback on the calling thread
+
+    def generate_and_write(group):
+        limiter.acquire()
+        if stream and len(group) == 1:
+            code = stream_code_for_file(project_name, project_description, project, group[0], llm_client,
+                                        use_cache, on_chunk=lambda *event: chunks.put(event), context=context)
+            return {group[0]: hash_text(code)}
+        codes = generate_code_for_files(project_name, project_description, project, group, llm_client,
+                                        use_cache, context)
+        for file_path, code in codes.items():
             with open(file_path, "w") as f:
                 f.write(code)
-    
-    return f"Code generation completed for project: {project_name} at {project_location}"
+        return {file_path: hash_text(code) for file_path, code in codes.items()}
+
+    def report_chunks():
+        while stream_callback:
+            try:
+                stream_callback(*chunks.get_nowait())
+            except queue.Empty:
+                return
+
+    generated, errors = [], {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(bind_context(generate_and_write), group): group for group in groups}
+            running, done = set(futures), 0
+            while running:
+                finished, running = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+                report_chunks()
+                for future in finished:
+                    error = future.exception()
+                    output_hashes = future.result() if error is None else {}
+                    for file_path in futures[future]:
+                        done += 1
+                        relative_path = os.path.relpath(file_path, project_location)
+                        if error is not None:
+                            errors[file_path] = error
+                        else:
+                            record_file(manifest, relative_path, prompt_hashes[file_path], output_hashes[file_path])
+                            generated.append(relative_path)
+                        if progress_callback:
+                            progress_callback(done, len(pending), file_path, error)
+                    if error is None:
+                        save_manifest(project_location, manifest)  # A killed run resumes after this file
+    finally:
+        save_manifest(project_location, manifest)
+
+    if errors:
+        failed = ", ".join(os.path.basename(path) for path in errors)
+        raise RuntimeError(f"Code generation failed for {len(errors)} of {len(pending)} files: {failed}")
+
+    return {
+        "message": (f"Code generation completed for project: {project_name} at {project_location} "
+                    f"({len(generated)} generated, {len(skipped)} skipped, {len(removed)} removed, "
+                    f"~{sum(prompt_tokens.values())} prompt tokens)"),
+        "generated": sorted(generated),
+        "skipped": skipped,
+        "removed": removed,
+        "prompt_tokens": prompt_tokens,
+    }
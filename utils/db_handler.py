@@ -0,0 +1,306 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from utils.project_structure import ProjectStructure
+from utils.tracing import TracedConnection
+
+DB_NAME = "database/folder_structure.db"
+
+# Queries are module constants so sqlite3's per-connection statement cache keeps them prepared
+SELECT_PROJECT_NAMES = "SELECT project_name FROM folder_structures"
+SELECT_STRUCTURE_VERSION = "SELECT version FROM structure_version"
+SELECT_PROJECT_STRUCTURE = "SELECT folder_structure FROM folder_structures WHERE project_name = ?"
+UPSERT_PROJECT_STRUCTURE = """
+    INSERT INTO folder_structures (project_name, user_prompt, folder_structure)
+    VALUES (?, ?, ?)
+    ON CONFLICT(project_name)
+    DO UPDATE SET
+        user_prompt = excluded.user_prompt,
+        folder_structure = excluded.folder_structure
+"""
+
+STRUCTURE_CACHE_SIZE = 256  # Loaded project structures kept in memory
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+_cache_lock = threading.Lock()
+_structure_cache = OrderedDict()
+_project_names = None
+_structure_version = None  # Last seen structure_version, shared by every thread
+
+class FrozenDict(dict):
+    """A read-only dict, so cached structures can be shared safely between callers."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Project structures are immutable; save a new structure instead.")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __hash__(self):
+        return hash(tuple(self.items()))
+
+def freeze(value):
+    """Recursively convert parsed JSON into FrozenDicts and tuples."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def migrate_v1(conn):
+    """Project folder structures."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS folder_structures (
+                        project_name TEXT PRIMARY KEY,
+                        user_prompt TEXT,
+                        folder_structure TEXT
+                    )''')
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(folder_structures)")]
+    if "user_prompt" not in columns:  # Databases created by the old folder setup page
+        conn.execute("ALTER TABLE folder_structures ADD COLUMN user_prompt TEXT")
+
+def migrate_v2(conn):
+    """Lint results, one row per file, and the lint cache."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS linting_results (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        project_name TEXT,
+                        folder_path TEXT,
+                        file_name TEXT,
+                        linting_output TEXT
+                    )''')
+    # Older databases kept every run; keep only the latest row per file before adding the key
+    conn.execute("""DELETE FROM linting_results WHERE id NOT IN (
+                        SELECT MAX(id) FROM linting_results GROUP BY project_name, folder_path, file_name
+                    )""")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_linting_results_file "
+                 "ON linting_results(project_name, folder_path, file_name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_linting_results_project ON linting_results(project_name)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS lint_cache (
+                        content_hash TEXT NOT NULL,
+                        verilator_version TEXT NOT NULL,
+                        lint_flags TEXT NOT NULL,
+                        linting_output TEXT NOT NULL,
+                        PRIMARY KEY (content_hash, verilator_version, lint_flags)
+                    )''')
+
+def migrate_v3(conn):
+    """Background jobs and their per-file progress."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        kind TEXT NOT NULL,
+                        project_name TEXT NOT NULL,
+                        params TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'queued',
+                        progress_done INTEGER NOT NULL DEFAULT 0,
+                        progress_total INTEGER NOT NULL DEFAULT 0,
+                        result TEXT,
+                        error TEXT,
+                        worker_pid INTEGER,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS job_files (
+                        job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+                        file_path TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        detail TEXT,
+                        updated_at REAL NOT NULL,
+                        PRIMARY KEY (job_id, file_path)
+                    )''')
+
+def migrate_v4(conn):
+    """Traced runs and their spans (LLM calls, tool runs, queries)."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS runs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        project_name TEXT,
+                        kind TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        error TEXT,
+                        started_at REAL NOT NULL,
+                        ended_at REAL NOT NULL
+                    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_project ON runs(project_name, id)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS spans (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+                        kind TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        started_at REAL NOT NULL,
+                        duration REAL NOT NULL,
+                        exit_code INTEGER,
+                        bytes_in INTEGER,
+                        bytes_out INTEGER,
+                        tokens_in INTEGER,
+                        tokens_out INTEGER,
+                        detail TEXT
+                    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_run ON spans(run_id, started_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_name ON spans(kind, name)")
+
+def migrate_v5(conn):
+    """Lint runs and their diagnostics parsed into rows."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS lint_runs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        project_name TEXT NOT NULL,
+                        folder_path TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        files INTEGER NOT NULL DEFAULT 0,
+                        errors INTEGER NOT NULL DEFAULT 0,
+                        warnings INTEGER NOT NULL DEFAULT 0
+                    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lint_runs_project ON lint_runs(project_name, folder_path, id)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS lint_diagnostics (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        run_id INTEGER NOT NULL REFERENCES lint_runs(id) ON DELETE CASCADE,
+                        file_name TEXT NOT NULL,
+                        line INTEGER,
+                        col INTEGER,
+                        severity TEXT NOT NULL,
+                        code TEXT NOT NULL DEFAULT '',
+                        message TEXT NOT NULL
+                    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lint_diagnostics_severity ON lint_diagnostics(run_id, severity, code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lint_diagnostics_file ON lint_diagnostics(run_id, file_name)")
+
+def migrate_v6(conn):
+    """Lint results keyed by the path relative to the project root instead of the bare file name."""
+    # Structure files always live in a directory, so rows without a separator predate the change
+    conn.execute("DELETE FROM linting_results WHERE instr(file_name, '/') = 0")
+
+def migrate_v7(conn):
+    """A counter bumped by triggers on every write to folder_structures, from any connection or process."""
+    conn.execute("CREATE TABLE IF NOT EXISTS structure_version (id INTEGER PRIMARY KEY CHECK (id = 1), "
+                 "version INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO structure_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS folder_structures_{event.lower()} AFTER {event} "
+                     f"ON folder_structures BEGIN UPDATE structure_version SET version = version + 1; END")
+
+def migrate_cache_v1(conn):
+    """Cached LLM responses (the prompt cache database)."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS llm_responses (
+                        cache_key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        response TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses(last_used)")
+
+# Schema migrations in order; PRAGMA user_version records how many have been applied
+MIGRATIONS = [migrate_v1, migrate_v2, migrate_v3, migrate_v4, migrate_v5, migrate_v6, migrate_v7]
+CACHE_MIGRATIONS = [migrate_cache_v1]  # The prompt cache lives in its own database file
+
+def initialize_database(conn, migrations=MIGRATIONS):
+    """Bring the database schema up to date, applying each pending migration once."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(migrations[version:], start=version + 1):
+        with conn:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+
+def get_connection(db_name=None, migrations=MIGRATIONS):
+    """Return this thread's connection to the database, opening it on first use.
+
+    Connections are reused for the lifetime of the thread, run in WAL mode so
+    readers never block the writer, and the schema (`migrations`, the main
+    database's by default) is migrated once per process.
+    Queries are recorded as spans while a run is traced (see utils.tracing).
+    """
+    db_name = db_name or DB_NAME
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_name)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_name) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_name, timeout=30, factory=TracedConnection)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _schema_lock:
+            if db_name not in _schema_ready:
+                initialize_database(conn, migrations)
+                _schema_ready.add(db_name)
+        connections[db_name] = conn
+    return conn
+
+def close_connection(db_name=None):
+    """Close this thread's connection, if it has one."""
+    conn = getattr(_local, "connections", {}).pop(db_name or DB_NAME, None)
+    if conn is not None:
+        conn.close()
+
+def invalidate_cache(project_name=None):
+    """Drop one cached project structure, or everything when no name is given."""
+    global _project_names
+    with _cache_lock:
+        _project_names = None
+        if project_name is None:
+            _structure_cache.clear()
+        else:
+            _structure_cache.pop(project_name, None)
+
+def check_external_changes(conn):
+    """Clear the caches when a structure was saved elsewhere since we last looked.
+
+    Only writes to folder_structures bump the version (see migrate_v7), so job
+    progress, spans and lint runs committed by other connections keep the
+    cache warm.
+    """
+    global _structure_version, _project_names
+    version = conn.execute(SELECT_STRUCTURE_VERSION).fetchone()[0]
+    with _cache_lock:
+        if _structure_version is not None and version != _structure_version:
+            _project_names = None
+            _structure_cache.clear()
+        _structure_version = version
+
+def get_project_names():
+    """Fetch all saved project names, cached until a structure is saved."""
+    global _project_names
+    check_external_changes(get_connection())
+    with _cache_lock:
+        if _project_names is not None:
+            return list(_project_names)
+    names = tuple(row[0] for row in get_connection().execute(SELECT_PROJECT_NAMES))
+    with _cache_lock:
+        _project_names = names
+    return list(names)
+
+def get_project(project_name):
+    """Fetch the ProjectStructure of a project, or None if it does not exist.
+
+    Structures are parsed and indexed once per load and kept in a
+    process-wide LRU cache; the returned objects are immutable and shared by
+    every stage.
+    """
+    check_external_changes(get_connection())
+    with _cache_lock:
+        if project_name in _structure_cache:
+            _structure_cache.move_to_end(project_name)
+            return _structure_cache[project_name]
+
+    row = get_connection().execute(SELECT_PROJECT_STRUCTURE, (project_name,)).fetchone()
+    project = ProjectStructure.from_dict(freeze(json.loads(row[0]))) if row else None
+    with _cache_lock:
+        _structure_cache[project_name] = project
+        while len(_structure_cache) > STRUCTURE_CACHE_SIZE:
+            _structure_cache.popitem(last=False)
+    return project
+
+def get_project_structure(project_name):
+    """Fetch the stored folder structure dict of a project (a FrozenDict), or {} if it does not exist."""
+    project = get_project(project_name)
+    return project.raw if project else FrozenDict()
+
+def save_project_structure(project_name, user_prompt, folder_structure):
+    """Save a new project folder structure (a JSON string) or update an existing one."""
+    conn = get_connection()
+    with conn:
+        conn.execute(UPSERT_PROJECT_STRUCTURE, (project_name, user_prompt, folder_structure))
+    invalidate_cache(project_name)
@@ -1,57 +1,78 @@
 import os
-import json
-import sqlite3
-from pathlib import Path
-
-DB_NAME = "database/folder_structure.db"
-
-def create_folders(base_path, folder_structure):
-    """Recursively create the folder structure."""
-    project_root = os.path.join(base_path, folder_structure["project_name"])
-    
-    if not os.path.exists(project_root):
-        os.makedirs(project_root)
-
-    for directory in folder_structure["directories"]:
-        dir_path = os.path.join(project_root, directory["name"])
-        os.makedirs(dir_path, exist_ok=True)
-
-        for file in directory.get("files", []):
-            file_path = os.path.join(dir_path, file)
-            open(file_path, 'w').close()  # Create an empty file
-
-        for subdir in directory.get("subdirectories", []):
-            subdir_path = os.path.join(dir_path, subdir["name"])
-            os.makedirs(subdir_path, exist_ok=True)
-    
-    return project_root
-
-def get_all_project_names():
-    """Fetch all saved project names from the database."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT project_name FROM folder_structures")
-    projects = [row[0] for row in c.fetchall()]
-    conn.close()
-    return projects
-
-def get_project_structure(project_name):
-    """Fetch the folder structure of the selected project."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT folder_structure FROM folder_structures WHERE project_name = ?", (project_name,))
-    row = c.fetchone()
-    conn.close()
-    return json.loads(row[0]) if row else {}
-
-# Ensure the database exists with the necessary table
-def initialize_database():
-    """Create database table if it does not exist."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS folder_structures (
-                    project_name TEXT PRIMARY KEY,
-                    folder_structure TEXT NOT NULL
-                )''')
-    conn.commit()
-    conn.close()
\ No newline at end of file
+from concurrent.futures import ThreadPoolExecutor
+
+MATERIALIZE_BATCH_SIZE = 256  # Paths created per task when applying a plan
+
+def plan_folders(base_path, project):
+    """Plan the directories and empty files needed to materialize a ProjectStructure.
+
+    Paths that already exist are left out, so an existing workspace is never
+    touched. Returns {"root", "directories", "files"}; parents come before
+    children.
+    """
+    project_root = os.path.join(base_path, project.project_name)
+    directories = [] if os.path.isdir(project_root) else [project_root]
+    missing = set()
+    for directory in project.directories:
+        dir_path = os.path.join(project_root, directory.path)
+        if not os.path.isdir(dir_path):
+            directories.append(dir_path)
+            missing.add(directory.path)
+    # Files of a directory that does not exist yet cannot exist either, so skip their stat calls
+    files = [file_path for file, file_path in ((file, os.path.join(project_root, file.path)) for file in project.files)
+             if file.directory in missing or not os.path.exists(file_path)]
+    return {"root": project_root, "directories": directories, "files": files}
+
+def describe_plan(plan):
+    """Dry-run diff of a plan: one "+ path" line per directory (ending in "/") and file to create."""
+    base_path = os.path.dirname(plan["root"])
+    return ([f"+ {os.path.relpath(path, base_path)}/" for path in plan["directories"]]
+            + [f"+ {os.path.relpath(path, base_path)}" for path in plan["files"]])
+
+def make_directories(paths):
+    errors = []
+    for path in paths:
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError as e:
+            errors.append(f"{path}: {e}")
+    return errors
+
+def make_files(paths):
+    """Create empty files; "x" mode never truncates a file that appeared since planning."""
+    errors = []
+    for path in paths:
+        try:
+            open(path, "x").close()
+        except FileExistsError:
+            pass
+        except OSError as e:
+            errors.append(f"{path}: {e}")
+    return errors
+
+def apply_plan(plan, max_workers=8, batch_size=MATERIALIZE_BATCH_SIZE):
+    """Create the planned directories, then the planned files, in parallel batches.
+
+    Returns the errors of paths that could not be created, e.g. a file where
+    a directory is expected.
+    """
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for create, paths in ((make_directories, plan["directories"]), (make_files, plan["files"])):
+            batches = [paths[start:start + batch_size] for start in range(0, len(paths), batch_size)]
+            for batch_errors in executor.map(create, batches):  # All directories exist before any file is made
+                errors += batch_errors
+    return errors
+
+def create_folders(base_path, project, max_workers=8):
+    """Recursively create the folder structure, leaving existing paths untouched.
+
+    Safe to re-run on a populated workspace; use plan_folders and
+    describe_plan for a dry run. Returns the project root and raises OSError
+    listing the paths that could not be created.
+    """
+    plan = plan_folders(base_path, project)
+    errors = apply_plan(plan, max_workers)
+    if errors:
+        raise OSError("Could not create: " + "; ".join(errors))
+    return plan["root"]
@@ -1,57 +1,18 @@
-import os
-import streamlit as st
-from google import genai
-from dotenv import load_dotenv
 import json
 import re
-import sqlite3
-
-# Load API key from .env file
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-
-# Initialize Gemini API client
-client = genai.Client(api_key=API_KEY)
-
-def initialize_db():
-    db_path = "database/folder_structure.db"
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)  # Ensure directory exists
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS folder_structures (
-                    project_name TEXT PRIMARY KEY,
-                    user_prompt TEXT,
-                    folder_structure TEXT
-                 )''')
-    conn.commit()
-    conn.close()
+from utils.db_handler import get_project_structure, save_project_structure
+from utils.llm_cache import generate_text
+from utils.llm_client import get_client
 
 def save_or_update_structure(project_name, user_input, folder_structure):
-    initialize_db() 
-    db_path = "database/folder_structure.db"
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
     """Saves a new project folder structure or updates an existing one."""
-    c.execute("""
-        INSERT INTO folder_structures (project_name, user_prompt, folder_structure) 
-        VALUES (?, ?, ?) 
-        ON CONFLICT(project_name) 
-        DO UPDATE SET 
-            user_prompt = excluded.user_prompt,
-            folder_structure = excluded.folder_structure
-    """, (project_name, user_input,  folder_structure))
-    conn.commit()
+    save_project_structure(project_name, user_input, folder_structure)
 
 def get_structure_by_name(project_name):
     """Retrieves the latest folder structure for a given project name."""
-    db_path = "database/folder_structure.db"
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute("SELECT folder_structure FROM folder_structures WHERE project_name = ?", (project_name,))
-    row = c.fetchone()
-    return json.loads(row[0]) if row else {}
-
-def generate_rtl_structure(user_input):
+    return get_project_structure(project_name)
+
+def generate_rtl_structure(user_input, use_cache=True):
     prompt = f'''
     Generate a structured JSON output representing an RTL project folder hierarchy based on the following project description: "{user_input}". 
 
@@ -98,15 +59,15 @@ def generate_rtl_structure(user_input):
     Provide the JSON output following these constraints. Do not include any preamble, explanations, or markdown formatting.
     '''
 
-    response = client.models.generate_content(model="gemini-2.0-flash", contents=prompt)
-    clean_response = post_process_response(response.text)
+    response_text = generate_text(get_client(), prompt, use_cache=use_cache)
+    clean_response = post_process_response(response_text)
     validated_response = enforce_json_structure(clean_response)
     project_name = json.loads(validated_response).get("project_name", "Unnamed Project")
     save_or_update_structure(project_name, user_input, validated_response)
     return validated_response
 
 
-def modify_structure(existing_structure, user_modification):
+def modify_structure(existing_structure, user_modification, use_cache=True):
     prompt = f'''
         Modify the following RTL project folder structure based on this user request: "{user_modification}".
 
@@ -161,8 +122,8 @@ def modify_structure(existing_structure, user_modification):
         Provide the JSON output following these constraints. Do not include any preamble, explanations, or markdown formatting.
     '''
     
-    response = client.models.generate_content(model="gemini-2.0-flash", contents=prompt)
-    clean_response = post_process_response(response.text)
+    response_text = generate_text(get_client(), prompt, use_cache=use_cache)
+    clean_response = post_process_response(response_text)
     validated_response = enforce_json_structure(clean_response)
     project_name = json.loads(validated_response).get("project_name", "Unnamed Project")
     save_or_update_structure(project_name, user_modification, validated_response)
@@ -202,6 +163,7 @@ def enforce_json_structure(json_text):
 
 
 def rtl_structure_ui():
+    import streamlit as st
     st.title("RTL Folder Structure Generator & Modifier")
     user_input = st.text_area("Describe your RTL project:")
     if st.button("Generate Folder Structure"):
@@ -0,0 +1,54 @@
+import sys
+import json
+import argparse
+import subprocess
+
+# Entry points that must start fast: the CLIs and every stage module app.py imports
+HEADLESS_MODULES = ("utils.batch", "utils.pipeline", "utils.jobs", "utils.benchmark", "utils.code_generator",
+                    "utils.linting", "utils.synthesis", "utils.folder_structure_generation", "utils.folder_setup")
+IMPORT_BUDGET_MS = 150  # Cumulative import time allowed for each module, measured in a fresh interpreter
+HEAVY_MODULES = ("streamlit", "google.genai", "PIL", "altair", "dotenv", "pandas")  # Must only load on first use
+
+def measure_import(module):
+    """Import `module` in a fresh interpreter with -X importtime.
+
+    Returns {"module", "total_ms", "slowest", "heavy"}: the cumulative import
+    time, the five slowest nested imports and the heavy dependencies that
+    were loaded.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ImportError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative) / 1000
+    heavy = sorted({heavy for heavy in HEAVY_MODULES for name in timings
+                    if name == heavy or name.startswith(heavy + ".")})
+    slowest = sorted(((name, time_ms) for name, time_ms in timings.items() if name != module),
+                     key=lambda item: item[1], reverse=True)[:5]
+    return {"module": module, "total_ms": round(timings.get(module, 0.0), 1),
+            "slowest": [{"module": name, "ms": round(time_ms, 1)} for name, time_ms in slowest], "heavy": heavy}
+
+def check_budget(modules=HEADLESS_MODULES, budget_ms=IMPORT_BUDGET_MS):
+    """Measure each module and report whether it stays within the budget without loading heavy dependencies."""
+    reports = [measure_import(module) for module in modules]
+    for report in reports:
+        report["ok"] = report["total_ms"] <= budget_ms and not report["heavy"]
+    return {"budget_ms": budget_ms, "ok": all(report["ok"] for report in reports), "modules": reports}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check module import times with python -X importtime.")
+    parser.add_argument("modules", nargs="*", default=list(HEADLESS_MODULES), help="modules to measure")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS, help="allowed import time per module")
+    args = parser.parse_args(argv)
+
+    summary = check_budget(args.modules, args.budget_ms)
+    print(json.dumps(summary, indent=4))
+    return 0 if summary["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+from utils.db_handler import get_connection
+
+JOB_KINDS = ("generate_code", "lint", "synthesis")
+POLL_INTERVAL = 1.0  # Seconds an idle worker waits before looking for new jobs
+MAX_ATTEMPTS = 3  # Jobs interrupted this many times are marked failed instead of resumed
+
+def submit_job(kind, project_name, params):
+    """Queue a job and return its id. `params` are passed to the job's function as keyword arguments."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    conn = get_connection()
+    now = time.time()
+    with conn:
+        cursor = conn.execute("INSERT INTO jobs (kind, project_name, params, created_at, updated_at) "
+                              "VALUES (?, ?, ?, ?, ?)", (kind, project_name, json.dumps(params), now, now))
+    return cursor.lastrowid
+
+def row_to_job(row):
+    job = dict(zip(("id", "kind", "project_name", "params", "status", "progress_done", "progress_total", "result",
+                    "error", "worker_pid", "attempts", "created_at", "updated_at"), row))
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def get_job(job_id):
+    row = get_connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row_to_job(row) if row else None
+
+def list_jobs(limit=50):
+    """Most recent jobs first."""
+    return [row_to_job(row) for row in get_connection().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))]
+
+def get_job_files(job_id):
+    """Per-file progress of a job as (file_path, status, detail) rows."""
+    return get_connection().execute("SELECT file_path, status, detail FROM job_files WHERE job_id = ? "
+                                    "ORDER BY updated_at", (job_id,)).fetchall()
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def recover_orphaned_jobs():
+    """Requeue running jobs whose worker died, so they resume after a restart."""
+    conn = get_connection()
+    orphaned = [job_id for job_id, pid in conn.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'")
+                if not pid or not is_process_alive(pid)]
+    with conn:
+        for job_id in orphaned:
+            conn.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                         "error = CASE WHEN attempts >= ? THEN 'Interrupted too many times' ELSE error END, "
+                         "worker_pid = NULL, updated_at = ? WHERE id = ?",
+                         (MAX_ATTEMPTS, MAX_ATTEMPTS, time.time(), job_id))
+    return orphaned
+
+def claim_job():
+    """Atomically take the oldest queued job for this process, or return None."""
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        conn.execute("UPDATE jobs SET status = 'running', worker_pid = ?, attempts = attempts + 1, updated_at = ? "
+                     "WHERE id = ?", (os.getpid(), time.time(), row[0]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return get_job(row[0])
+
+def record_progress(job_id, done, total, file_path=None, status="done", detail=None):
+    """Store overall progress and, when given, the state of one file."""
+    conn = get_connection()
+    now = time.time()
+    with conn:
+        conn.execute("UPDATE jobs SET progress_done = ?, progress_total = ?, updated_at = ? WHERE id = ?",
+                     (done, total, now, job_id))
+        if file_path:
+            conn.execute("INSERT OR REPLACE INTO job_files (job_id, file_path, status, detail, updated_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (job_id, file_path, status, detail, now))
+
+def finish_job(job_id, result=None, error=None):
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, worker_pid = NULL, updated_at = ? WHERE id = ?",
+                     ("failed" if error else "done", json.dumps(result) if result is not None else None, error,
+                      time.time(), job_id))
+
+def run_job(job):
+    """Run one job to completion. Interrupted jobs are simply run again: code generation,
+    lint and synthesis all skip work whose inputs are unchanged, so they resume where they stopped."""
+    job_id, project_name, params = job["id"], job["project_name"], job["params"]
+
+    if job["kind"] == "generate_code":
+        from utils.code_generator import generate_code
+        return generate_code(project_name, progress_callback=lambda done, total, file_path, error: record_progress(
+            job_id, done, total, file_path, "failed" if error else "done", str(error) if error else None), **params)
+
+    if job["kind"] == "lint":
+        from utils.linting import run_linting
+        results = run_linting(project_name, progress_callback=lambda done, total, file_name: record_progress(
+            job_id, done, total, file_name), **params)
+        if isinstance(results, str):
+            raise ValueError(results)
+        for file_name, lint_output in results:
+            record_progress(job_id, len(results), len(results), file_name, "issues" if lint_output else "clean")
+        return {"files": len(results), "with_issues": sum(1 for _, lint_output in results if lint_output)}
+
+    from utils.synthesis import iter_synthesis
+    summary = {"built": 0, "cached": 0, "errors": 0}
+    totals = {"total": 0}
+
+    def set_total(total):
+        totals["total"] = total
+        record_progress(job_id, 0, total)
+
+    for done, (base_name, _, error, cached) in enumerate(iter_synthesis(project_name=project_name,
+                                                                        total_callback=set_total, **params), start=1):
+        summary["errors" if error else "cached" if cached else "built"] += 1
+        record_progress(job_id, done, max(totals["total"], done), base_name,
+                        "failed" if error else "cached" if cached else "done", error)
+    return summary
+
+def run_worker(stop_when_idle=False):
+    """Process queued jobs until stopped (or until the queue is empty with `stop_when_idle`)."""
+    recover_orphaned_jobs()
+    while True:
+        job = claim_job()
+        if job is None:
+            if stop_when_idle:
+                return
+            time.sleep(POLL_INTERVAL)
+            recover_orphaned_jobs()
+            continue
+        try:
+            result = run_job(job)
+        except Exception as e:
+            finish_job(job["id"], error=f"{e}\n{traceback.format_exc()}")
+        else:
+            finish_job(job["id"], result=result)
+
+def start_workers(count):
+    """Start `count` daemon worker processes. Spawned, so none of them inherits a database connection."""
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, name=f"job-worker-{index}", daemon=True) for index in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--workers", type=int, default=2, help="number of worker processes")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+    if args.once:
+        run_worker(stop_when_idle=True)
+        return
+    for worker in start_workers(args.workers):
+        worker.join()
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,350 @@
 import os
-import sqlite3
+import re
 import json
-import streamlit as st
-from subprocess import run, PIPE
+import time
+import hashlib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import PIPE, TimeoutExpired
+from utils.db_handler import get_connection, get_project, get_project_names
+from utils.project_structure import HEADER_SUFFIXES
+from utils.tracing import bind_context, run_tool, traced
+
+LINT_TIMEOUT = 60  # Seconds allowed for a single Verilator run
+FILE_LINT_FLAGS = ["--lint-only"]
+PROJECT_LINT_KEY = "(project)"  # File name for diagnostics that cannot be tied to a file
+LINT_RUNS_KEPT = 20  # Parsed diagnostics are kept for this many runs per project folder
+DIAGNOSTICS_PAGE_SIZE = 50  # Diagnostics rendered per page in the UI
+
+# Start of a Verilator diagnostic, e.g. "%Warning-UNUSED: src/alu.v:12:5: Signal is not used"
+DIAGNOSTIC_RE = re.compile(r"^%(?P<severity>[A-Za-z]+)(?:-(?P<code>[A-Z0-9_]+))?: "
+                           r"(?:(?P<path>[^:\s]+):(?P<line>\d+):(?:(?P<column>\d+):)?)?\s*(?P<message>.*)")
 
 def init_db():
-    """Initialize the SQLite database and create table if not exists."""
-    conn = sqlite3.connect("database/folder_structure.db", check_same_thread=False)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS linting_results (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_name TEXT,
-                    folder_path TEXT,
-                    file_name TEXT,
-                    linting_output TEXT
-                )''')
-    conn.commit()
-    return conn, c
+    """Return this thread's shared database connection and a cursor on it."""
+    conn = get_connection()
+    return conn, conn.cursor()
+
+@lru_cache(maxsize=1)
+def get_verilator_version():
+    """Verilator version string, part of every lint cache key."""
+    try:
+        return run_tool(["verilator", "--version"], stdout=PIPE, stderr=PIPE, text=True).stdout.strip()
+    except FileNotFoundError:
+        return "unknown"
 
-def get_available_projects(c):
-    """Fetch available project names from the database."""
-    c.execute("SELECT project_name FROM folder_structures")
-    return [row[0] for row in c.fetchall()]
+def hash_files(file_paths):
+    """Content hash of one or more files in order, or None if any is missing."""
+    digest = hashlib.sha256()
+    for file_path in file_paths:
+        try:
+            with open(file_path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        except FileNotFoundError:
+            return None
+    return digest.hexdigest()
 
-def get_project_details(c, project_name):
-    """Retrieve folder structure from the database."""
-    c.execute("SELECT folder_structure FROM folder_structures WHERE project_name = ?", (project_name,))
+def get_cached_lint(c, content_hash, lint_flags):
+    """Return stored Verilator output for this content and flags, or None."""
+    if content_hash is None:
+        return None
+    c.execute("SELECT linting_output FROM lint_cache WHERE content_hash = ? AND verilator_version = ? AND lint_flags = ?",
+              (content_hash, get_verilator_version(), json.dumps(lint_flags)))
     row = c.fetchone()
-    return json.loads(row[0]) if row else {}
+    return row[0] if row else None
+
+def store_cached_lints(c, entries):
+    """Store (content_hash, lint_flags, linting_output) entries in the lint cache."""
+    c.executemany("INSERT OR REPLACE INTO lint_cache (content_hash, verilator_version, lint_flags, linting_output) "
+                  "VALUES (?, ?, ?, ?)",
+                  [(content_hash, get_verilator_version(), json.dumps(lint_flags), linting_output)
+                   for content_hash, lint_flags, linting_output in entries if content_hash is not None])
 
-def lint_verilog_file(file_path):
+def run_verilator(command, timeout=LINT_TIMEOUT):
+    """Run Verilator and return (stderr, completed); completed is False on timeout."""
+    try:
+        result = run_tool(command, stdout=PIPE, stderr=PIPE, text=True, timeout=timeout)
+    except TimeoutExpired:
+        return f"%Error: Verilator timed out after {timeout} seconds\n", False
+    return result.stderr, True  # Verilator prints errors/warnings to stderr
+
+def file_lint_command(file_path):
+    """Verilator command linting one file. It is also the file's lint cache flag set: the output names the
+    file's path, so identical files in different places must not share an entry."""
+    return ["verilator", *FILE_LINT_FLAGS, file_path]
+
+def lint_verilog_file(file_path, timeout=LINT_TIMEOUT):
     """Runs Verilator linting on a single Verilog file and returns the output."""
-    result = run(["verilator", "--lint-only", file_path], stdout=PIPE, stderr=PIPE, text=True)
-    return result.stderr  # Verilator prints errors/warnings to stderr
+    return run_verilator(file_lint_command(file_path), timeout)[0]
+
+def lint_file_cached(file_path, timeout=LINT_TIMEOUT):
+    """Lint one file through the lint cache; safe to call from any thread."""
+    conn = get_connection()
+    c = conn.cursor()
+    content_hash = hash_files([file_path])
+    command = file_lint_command(file_path)
+    lint_output = get_cached_lint(c, content_hash, command)
+    if lint_output is None:
+        lint_output, completed = run_verilator(command, timeout)
+        if completed:
+            store_cached_lints(c, [(content_hash, command, lint_output)])
+            conn.commit()
+    return lint_output
+
+def parse_diagnostics(lint_output):
+    """Parse Verilator output into (line, column, severity, code, message) rows.
+
+    Source excerpts and other continuation lines are left out; the raw output
+    stays in linting_results.
+    """
+    diagnostics = []
+    for text in lint_output.splitlines():
+        match = DIAGNOSTIC_RE.match(text)
+        if match and not text.startswith("%Error: Exiting due to"):
+            diagnostics.append((int(match.group("line")) if match.group("line") else None,
+                                int(match.group("column")) if match.group("column") else None,
+                                match.group("severity").lower(), match.group("code") or "",
+                                match.group("message").strip()))
+    return diagnostics
 
-def store_linting_result(c, conn, project_name, folder_path, file_name, linting_output):
-    """Stores linting results in the database."""
-    c.execute("INSERT INTO linting_results (project_name, folder_path, file_name, linting_output) VALUES (?, ?, ?, ?)",
-              (project_name, folder_path, file_name, linting_output))
+def store_lint_run(c, project_name, folder_path, results):
+    """Record a lint run with its parsed diagnostics and return its id.
+
+    Only the latest LINT_RUNS_KEPT runs of each project folder are kept.
+    """
+    diagnostics = [(file_name, *diagnostic) for file_name, lint_output in results
+                   for diagnostic in parse_diagnostics(lint_output)]
+    c.execute("INSERT INTO lint_runs (project_name, folder_path, created_at, files, errors, warnings) "
+              "VALUES (?, ?, ?, ?, ?, ?)",
+              (project_name, folder_path, time.time(), len(results),
+               sum(1 for diagnostic in diagnostics if diagnostic[3] == "error"),
+               sum(1 for diagnostic in diagnostics if diagnostic[3] == "warning")))
+    run_id = c.lastrowid
+    c.executemany("INSERT INTO lint_diagnostics (run_id, file_name, line, col, severity, code, message) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)", [(run_id, *diagnostic) for diagnostic in diagnostics])
+
+    stale_runs = ("SELECT id FROM lint_runs WHERE project_name = ? AND folder_path = ? "
+                  "ORDER BY id DESC LIMIT -1 OFFSET ?")
+    c.execute(f"DELETE FROM lint_diagnostics WHERE run_id IN ({stale_runs})", (project_name, folder_path, LINT_RUNS_KEPT))
+    c.execute(f"DELETE FROM lint_runs WHERE id IN ({stale_runs})", (project_name, folder_path, LINT_RUNS_KEPT))
+    return run_id
+
+def store_linting_results(c, conn, project_name, folder_path, results):
+    """Stores all (relative_path, linting_output) results in one transaction, replacing earlier runs.
+
+    The parsed diagnostics are recorded as a new lint run; returns its id.
+    """
+    c.executemany("""
+        INSERT INTO linting_results (project_name, folder_path, file_name, linting_output) VALUES (?, ?, ?, ?)
+        ON CONFLICT(project_name, folder_path, file_name)
+        DO UPDATE SET linting_output = excluded.linting_output
+    """, [(project_name, folder_path, file_name, linting_output) for file_name, linting_output in results])
+    run_id = store_lint_run(c, project_name, folder_path, results)
     conn.commit()
+    return run_id
+
+def get_lint_runs(project_name, limit=LINT_RUNS_KEPT):
+    """Most recent lint runs of a project with their file, error and warning counts."""
+    rows = get_connection().execute("SELECT id, folder_path, created_at, files, errors, warnings FROM lint_runs "
+                                    "WHERE project_name = ? ORDER BY id DESC LIMIT ?", (project_name, limit))
+    return [dict(zip(("id", "folder_path", "created_at", "files", "errors", "warnings"), row)) for row in rows]
+
+def get_previous_lint_run(run_id):
+    """The run of the same project folder before `run_id`, or None."""
+    row = get_connection().execute("""
+        SELECT previous.id, previous.folder_path, previous.created_at, previous.files, previous.errors,
+               previous.warnings
+        FROM lint_runs AS run JOIN lint_runs AS previous
+          ON previous.project_name = run.project_name AND previous.folder_path = run.folder_path
+         AND previous.id < run.id
+        WHERE run.id = ? ORDER BY previous.id DESC LIMIT 1
+    """, (run_id,)).fetchone()
+    return dict(zip(("id", "folder_path", "created_at", "files", "errors", "warnings"), row)) if row else None
+
+def diagnostic_filter(run_id, severities=None, codes=None, file_name=None):
+    """WHERE clause and parameters selecting a run's diagnostics."""
+    clauses, parameters = ["run_id = ?"], [run_id]
+    if severities:
+        clauses.append(f"severity IN ({', '.join('?' * len(severities))})")
+        parameters += severities
+    if codes:
+        clauses.append(f"code IN ({', '.join('?' * len(codes))})")
+        parameters += codes
+    if file_name:
+        clauses.append("instr(file_name, ?) > 0")
+        parameters.append(file_name)
+    return " AND ".join(clauses), parameters
+
+def count_diagnostics(run_id, severities=None, codes=None, file_name=None):
+    where, parameters = diagnostic_filter(run_id, severities, codes, file_name)
+    return get_connection().execute(f"SELECT COUNT(*) FROM lint_diagnostics WHERE {where}", parameters).fetchone()[0]
+
+def get_diagnostics(run_id, severities=None, codes=None, file_name=None, limit=50, offset=0):
+    """One page of a run's diagnostics, filtered by severity, code and file name, in file and line order."""
+    where, parameters = diagnostic_filter(run_id, severities, codes, file_name)
+    rows = get_connection().execute(f"SELECT file_name, line, col, severity, code, message FROM lint_diagnostics "
+                                    f"WHERE {where} ORDER BY file_name, line, col LIMIT ? OFFSET ?",
+                                    parameters + [limit, offset])
+    return [dict(zip(("file_name", "line", "column", "severity", "code", "message"), row)) for row in rows]
+
+def summarize_diagnostics(run_id):
+    """Diagnostic and file counts per severity and code for a run, most frequent first."""
+    rows = get_connection().execute("SELECT severity, code, COUNT(*), COUNT(DISTINCT file_name) FROM lint_diagnostics "
+                                    "WHERE run_id = ? GROUP BY severity, code ORDER BY COUNT(*) DESC", (run_id,))
+    return [dict(zip(("severity", "code", "count", "files"), row)) for row in rows]
+
+def diagnostic_difference(run_id, other_run_id, limit=100):
+    """Diagnostics of `run_id` that `other_run_id` does not have, ignoring line numbers.
 
-def lint_project(c, conn, project_name, folder_path):
-    """Lint all Verilog files in the selected project's folder structure."""
-    folder_structure = get_project_details(c, project_name)
+    Returns (count, up to `limit` rows); with the previous run as `other_run_id`
+    these are the new diagnostics, with the arguments swapped the fixed ones.
+    """
+    difference = ("SELECT file_name, severity, code, message FROM lint_diagnostics WHERE run_id = ? EXCEPT "
+                  "SELECT file_name, severity, code, message FROM lint_diagnostics WHERE run_id = ?")
+    conn = get_connection()
+    count = conn.execute(f"SELECT COUNT(*) FROM ({difference})", (run_id, other_run_id)).fetchone()[0]
+    rows = conn.execute(f"{difference} ORDER BY file_name LIMIT ?", (run_id, other_run_id, limit))
+    return count, [dict(zip(("file_name", "severity", "code", "message"), row)) for row in rows]
+
+def lint_project(c, conn, project_name, folder_path, jobs=None, timeout=LINT_TIMEOUT, progress_callback=None):
+    """Lint all Verilog files in the selected project's folder structure.
+
+    Files whose content was already linted at the same path with the same
+    Verilator version and flags are answered from the lint cache; the rest are linted in parallel with
+    up to `jobs` Verilator processes (one per CPU core by default). Results keep
+    the folder structure order and are keyed by the path relative to the
+    project root, so files with the same name in different directories stay
+    apart. `progress_callback(done, total, relative_path)` is called as files
+    finish.
+    """
+    project = get_project(project_name)
     
-    if not folder_structure:
+    if not project:
         return "No folder structure found for the selected project."
     
-    results = []
-    for directory in folder_structure.get("directories", []):
-        dir_path = os.path.join(folder_path, directory["name"])
-        
-        for file_name in directory.get("files", []):
-            if file_name.endswith((".v", ".sv")):
-                file_path = os.path.join(dir_path, file_name)
-                
-                lint_output = lint_verilog_file(file_path)
-                store_linting_result(c, conn, project_name, folder_path, file_name, lint_output)
-                
-                results.append((file_name, lint_output))
-    
+    lint_files = [(file.path, os.path.join(folder_path, file.path)) for file in project.files_of("rtl", "testbench")]
+
+    content_hashes = [hash_files([file_path]) for _, file_path in lint_files]
+    commands = [file_lint_command(file_path) for _, file_path in lint_files]
+    outputs = [get_cached_lint(c, content_hash, command) for content_hash, command in zip(content_hashes, commands)]
+    misses = [index for index, output in enumerate(outputs) if output is None]
+    done = len(lint_files) - len(misses)
+    if progress_callback and done:
+        progress_callback(done, len(lint_files), None)
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        lint_runs = executor.map(bind_context(lambda index: run_verilator(commands[index], timeout)), misses)
+        new_entries = []
+        for index, (lint_output, completed) in zip(misses, lint_runs):
+            outputs[index] = lint_output
+            done += 1
+            if progress_callback:
+                progress_callback(done, len(lint_files), lint_files[index][0])
+            if completed:
+                new_entries.append((content_hashes[index], commands[index], lint_output))
+
+    store_cached_lints(c, new_entries)
+    results = [(relative_path, lint_output) for (relative_path, _), lint_output in zip(lint_files, outputs)]
+    store_linting_results(c, conn, project_name, folder_path, results)
+    return results
+
+def include_directories(project, folder_path):
+    """Directories under `src`, searched for modules and `include files in a whole-project lint."""
+    return [os.path.join(folder_path, directory.path) for directory in project.directories if directory.top == "src"]
+
+def include_files(project, folder_path):
+    """Header files a whole-project lint can reach: the structure's headers and any under the include paths."""
+    headers = {file_path for file_path in project.paths(folder_path, "header") if os.path.exists(file_path)}
+    for dir_path in include_directories(project, folder_path):
+        try:
+            headers.update(entry.path for entry in os.scandir(dir_path)
+                           if entry.name.lower().endswith(HEADER_SUFFIXES) and entry.is_file())
+        except FileNotFoundError:
+            continue
+    return sorted(headers)
+
+def build_project_lint_command(project, folder_path, top_module=None, defines=None):
+    """Build one Verilator invocation covering every Verilog file of the project.
+
+    Directories under `src` are added as library (`-y`) and include
+    (`+incdir+`) paths so modules and headers resolve across files.
+    Returns the command and the ordered list of (relative_path, file_path) linted.
+    """
+    command = ["verilator", "--lint-only"]
+    for dir_path in include_directories(project, folder_path):
+        command += ["-y", dir_path, f"+incdir+{dir_path}"]
+    lint_files = [(file.path, os.path.join(folder_path, file.path)) for file in project.files_of("rtl", "testbench")]
+
+    for name, value in (defines or {}).items():
+        command.append(f"+define+{name}" if value is None else f"+define+{name}={value}")
+    if top_module:
+        command += ["--top-module", top_module]
+    else:
+        command.append("-Wno-MULTITOP")  # Testbenches are extra top-level modules
+    command += [file_path for _, file_path in lint_files]
+    return command, lint_files
+
+def split_diagnostics(output, lint_files):
+    """Split combined Verilator stderr into per-file output.
+
+    Continuation lines stay with the diagnostic they belong to. Diagnostics
+    without a project file location are grouped under PROJECT_LINT_KEY.
+    """
+    relative_paths = {os.path.abspath(file_path): relative_path for relative_path, file_path in lint_files}
+    per_file = {relative_path: [] for relative_path, _ in lint_files}
+    current = None
+    for line in output.splitlines(keepends=True):
+        match = DIAGNOSTIC_RE.match(line)
+        if match:
+            if line.startswith("%Error: Exiting due to"):
+                current = None
+                continue
+            path = match.group("path")
+            current = relative_paths.get(os.path.abspath(path), PROJECT_LINT_KEY) if path else PROJECT_LINT_KEY
+        if current is not None:
+            per_file.setdefault(current, []).append(line)
+    return [(relative_path, "".join(lines)) for relative_path, lines in per_file.items()]
+
+def lint_project_combined(c, conn, project_name, folder_path, top_module=None, defines=None, timeout=LINT_TIMEOUT):
+    """Lint the whole project in a single Verilator process and split results by file."""
+    project = get_project(project_name)
+
+    if not project:
+        return "No folder structure found for the selected project."
+
+    command, lint_files = build_project_lint_command(project, folder_path, top_module, defines)
+    if not lint_files:
+        return []
+
+    # The whole command (paths, defines, top) is the cache flag set; the content hash covers every file,
+    # including the headers pulled in through +incdir+
+    content_hash = hash_files([file_path for _, file_path in lint_files] + include_files(project, folder_path))
+    output = get_cached_lint(c, content_hash, command)
+    if output is None:
+        output, completed = run_verilator(command, timeout)
+        if completed:
+            store_cached_lints(c, [(content_hash, command, output)])
+
+    results = split_diagnostics(output, lint_files)
+    store_linting_results(c, conn, project_name, folder_path, results)
     return results
 
-def run_linting(project_name, project_folder):
-    """Wrapper function to run linting from app.py."""
+@traced("lint")
+def run_linting(project_name, project_folder, jobs=None, timeout=LINT_TIMEOUT, mode="file", top_module=None,
+                defines=None, progress_callback=None):
+    """Wrapper function to run linting from app.py.
+
+    `mode="file"` lints every file on its own; `mode="project"` lints the whole
+    project in one Verilator run with shared include paths and defines.
+    """
     conn, c = init_db()
-    return lint_project(c, conn, project_name, project_folder)
+    if mode == "project":
+        return lint_project_combined(c, conn, project_name, project_folder, top_module, defines, timeout)
+    return lint_project(c, conn, project_name, project_folder, jobs, timeout, progress_callback)
 
 def linting_ui():
     """Streamlit UI for linting Verilog files."""
+    import streamlit as st
     st.title("🔍 Verilog Linting with Verilator")
     st.markdown("Lint your Verilog files to identify syntax or logic issues.")
     
@@ -76,7 +352,7 @@ def linting_ui():
     
     st.sidebar.header("Project Selection")
     project_folder = st.sidebar.text_input("Enter Folder Path", placeholder="/path/to/project")
-    available_projects = get_available_projects(c)
+    available_projects = get_project_names()
     project_name = st.sidebar.selectbox("Select Project", available_projects)
     
     if st.sidebar.button("Start Linting"):
@@ -87,14 +363,20 @@ def linting_ui():
             if isinstance(results, str):
                 st.error(results)
             else:
-                st.subheader("Linting Results")
-                for file_name, lint_output in results:
-                    if lint_output:
-                        st.error(f"⚠ Issues in {file_name}")
-                        st.code(lint_output, language="plaintext")
-                    else:
-                        st.success(f"✅ No issues found in {file_name}")
+                with_issues = sum(1 for _, lint_output in results if lint_output)
+                st.write(f"{len(results)} files linted, {with_issues} with issues.")
             
             st.sidebar.success("✅ Linting process completed.")
         else:
-            st.sidebar.error("Please provide a folder path and select a project.")
\ No newline at end of file
+            st.sidebar.error("Please provide a folder path and select a project.")
+
+    # Only one page of the latest run's parsed diagnostics is rendered, however many files were linted
+    lint_runs = get_lint_runs(project_name, limit=1) if project_name else []
+    if lint_runs:
+        st.subheader("Linting Results")
+        total = count_diagnostics(lint_runs[0]["id"])
+        pages = max(1, -(-total // DIAGNOSTICS_PAGE_SIZE))
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+        st.dataframe(get_diagnostics(lint_runs[0]["id"], limit=DIAGNOSTICS_PAGE_SIZE,
+                                     offset=(page - 1) * DIAGNOSTICS_PAGE_SIZE))
+        st.caption(f"{total} diagnostics in run #{lint_runs[0]['id']}")
\ No newline at end of file
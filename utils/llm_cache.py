@@ -0,0 +1,112 @@
+import time
+import hashlib
+from utils.db_handler import CACHE_MIGRATIONS, get_connection
+from utils.tracing import span
+
+CACHE_DB = "database/llm_cache.db"
+CACHE_TTL_SECONDS = 30 * 24 * 60 * 60  # Entries older than 30 days are evicted
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # Least recently used entries are evicted beyond this size
+
+def get_cache_connection():
+    """This thread's pooled connection to the cache database; the schema comes from CACHE_MIGRATIONS."""
+    return get_connection(CACHE_DB, CACHE_MIGRATIONS)
+
+def cache_key(model, prompt):
+    """Content address of a request: hash of the model name plus the prompt."""
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+def get_cached_response(model, prompt, ttl=CACHE_TTL_SECONDS):
+    """Return the cached response text for this model and prompt, or None."""
+    key = cache_key(model, prompt)
+    now = time.time()
+    conn = get_cache_connection()
+    row = conn.execute("SELECT response, created_at FROM llm_responses WHERE cache_key = ?", (key,)).fetchone()
+    if row is None:
+        return None
+    with conn:
+        if ttl is not None and now - row[1] > ttl:
+            conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_responses SET last_used = ? WHERE cache_key = ?", (now, key))
+    return row[0]
+
+def store_response(model, prompt, response_text):
+    """Store a response and evict expired or least recently used entries."""
+    now = time.time()
+    conn = get_cache_connection()
+    with conn:
+        conn.execute("""
+            INSERT INTO llm_responses (cache_key, model, response, size, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(cache_key)
+            DO UPDATE SET response = excluded.response, size = excluded.size,
+                          created_at = excluded.created_at, last_used = excluded.last_used
+        """, (cache_key(model, prompt), model, response_text, len(response_text.encode("utf-8")), now, now))
+        evict(conn, now)
+
+def evict(conn, now=None, ttl=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES):
+    """Drop expired entries, then the least recently used ones until under `max_bytes`."""
+    now = now if now is not None else time.time()
+    if ttl is not None:
+        conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - ttl,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for key, size in conn.execute("SELECT cache_key, size FROM llm_responses ORDER BY last_used").fetchall():
+        if total <= max_bytes:
+            break
+        conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (key,))
+        total -= size
+
+def clear_cache():
+    """Remove every cached response."""
+    conn = get_cache_connection()
+    with conn:
+        conn.execute("DELETE FROM llm_responses")
+
+def token_counts(response):
+    """Prompt and response token counts reported by the API, where present."""
+    usage = getattr(response, "usage_metadata", None)
+    counts = {"tokens_in": getattr(usage, "prompt_token_count", None),
+              "tokens_out": getattr(usage, "candidates_token_count", None)}
+    return {key: value for key, value in counts.items() if value is not None}
+
+def generate_text(llm_client, prompt, model="gemini-2.0-flash", use_cache=True):
+    """Return the model's response text, served from the cache when possible.
+
+    With `use_cache=False` the cache is bypassed for the lookup but the fresh
+    response still replaces any stored entry.
+    """
+    if use_cache:
+        cached = get_cached_response(model, prompt)
+        if cached is not None:
+            return cached
+    with span("llm", model, bytes_in=len(prompt)) as record:
+        response = llm_client.models.generate_content(model=model, contents=prompt)
+        record.update(token_counts(response), bytes_out=len(response.text or ""))
+    store_response(model, prompt, response.text)
+    return response.text
+
+def stream_text(llm_client, prompt, model="gemini-2.0-flash", use_cache=True):
+    """Yield the model's response text in chunks as it is generated.
+
+    A cached response is yielded whole; a streamed one is stored in the cache
+    once it is complete.
+    """
+    if use_cache:
+        cached = get_cached_response(model, prompt)
+        if cached is not None:
+            yield cached
+            return
+    chunks = []
+    with span("llm", model, bytes_in=len(prompt), stream=True) as record:
+        started = time.perf_counter()
+        for chunk in llm_client.models.generate_content_stream(model=model, contents=prompt):
+            record.update(token_counts(chunk))  # Usage arrives with the final chunk
+            if chunk.text:
+                if not chunks:
+                    record["first_chunk_s"] = time.perf_counter() - started
+                chunks.append(chunk.text)
+                yield chunk.text
+        record["bytes_out"] = sum(len(text) for text in chunks)
+    store_response(model, prompt, "".join(chunks))
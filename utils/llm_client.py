@@ -0,0 +1,210 @@
+import os
+import time
+import random
+import threading
+
+REQUEST_TIMEOUT = 120  # Seconds allowed for a single HTTP request
+CALL_DEADLINE = 300  # Seconds a call may spend in total, including retries
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # First retry waits up to this many seconds, doubling each time
+BACKOFF_MAX = 60.0
+REQUESTS_PER_MINUTE = 60  # Shared by every caller of the process-wide client, in bursts of up to a minute's worth
+REQUESTS_PER_MINUTE_ENV = "LLM_REQUESTS_PER_MINUTE"  # Overrides REQUESTS_PER_MINUTE; 0 means unlimited
+FAILURE_THRESHOLD = 5  # Consecutive failures that open the circuit
+CIRCUIT_COOLDOWN = 30.0  # Seconds the circuit stays open before a trial call
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_client = None
+_client_lock = threading.Lock()
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it; without a rate only pauses are waited out."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.rate:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif not self.rate:
+                    return
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while, e.g. after the API reports quota exhaustion."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+class CircuitBreaker:
+    """Fails fast after repeated failures, then lets a single trial call through after a cooldown."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpenError("LLM API circuit is open after repeated failures; try again shortly.")
+            self.opened_at = time.monotonic()  # Half-open: this call is the trial, others keep failing fast
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+def error_status(error):
+    """HTTP status of an API error, if it has one."""
+    for attribute in ("code", "status_code"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # httpx transport errors (timeouts, resets) carry no status code
+    return type(error).__module__.startswith("httpx")
+
+class ResilientModels:
+    """Drop-in for `client.models` adding rate limiting, retries, deadlines and a circuit breaker."""
+
+    def __init__(self, models, bucket, breaker, max_retries=MAX_RETRIES, deadline=CALL_DEADLINE,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, sleep=time.sleep):
+        self.models = models
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+
+    def backoff(self, attempt, error, deadline_at):
+        """Wait before the next attempt, or re-raise when out of retries or time."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))  # Full jitter
+        if attempt >= self.max_retries or time.monotonic() + delay > deadline_at:
+            raise error
+        if error_status(error) == 429:
+            self.bucket.pause(delay)  # Slow every caller down, not just this one
+        self.sleep(delay)
+
+    def call(self, function, **kwargs):
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self.bucket.acquire()
+            try:
+                result = function(**kwargs)
+            except Exception as error:
+                if not is_retryable(error):
+                    raise
+                self.breaker.record_failure()
+                self.backoff(attempt, error, deadline_at)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def generate_content(self, **kwargs):
+        return self.call(self.models.generate_content, **kwargs)
+
+    def generate_content_stream(self, **kwargs):
+        """Stream a response; retries only happen before the first chunk has been yielded."""
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self.bucket.acquire()
+            started = False
+            try:
+                for chunk in self.models.generate_content_stream(**kwargs):
+                    started = True
+                    yield chunk
+            except Exception as error:
+                if started or not is_retryable(error):
+                    raise
+                self.breaker.record_failure()
+                self.backoff(attempt, error, deadline_at)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return
+
+    def __getattr__(self, name):
+        return getattr(self.models, name)
+
+class ResilientClient:
+    """Wraps a genai.Client (or any object with the same `models` API)."""
+
+    def __init__(self, client, requests_per_minute=REQUESTS_PER_MINUTE, **options):
+        self.client = client
+        self.bucket = TokenBucket(requests_per_minute / 60.0 if requests_per_minute else 0,
+                                  capacity=max(1, requests_per_minute or 0))
+        self.breaker = CircuitBreaker()
+        self.models = ResilientModels(client.models, self.bucket, self.breaker, **options)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+def get_client(requests_per_minute=None):
+    """The process-wide Gemini client, created on first use.
+
+    Its request limit is `requests_per_minute`, else the
+    LLM_REQUESTS_PER_MINUTE environment variable (0 = unlimited), else
+    REQUESTS_PER_MINUTE; it is fixed once the client exists.
+
+    google-genai and python-dotenv are imported here rather than at module
+    level, so importing this module (and every stage using it) stays cheap.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from dotenv import load_dotenv
+            from google import genai
+            from google.genai import types
+            load_dotenv()
+            if requests_per_minute is None:
+                requests_per_minute = float(os.getenv(REQUESTS_PER_MINUTE_ENV, REQUESTS_PER_MINUTE))
+            gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"),
+                                         http_options=types.HttpOptions(timeout=REQUEST_TIMEOUT * 1000))
+            _client = ResilientClient(gemini_client, requests_per_minute)
+        return _client
@@ -0,0 +1,70 @@
+import os
+import json
+import time
+import hashlib
+
+MANIFEST_NAME = ".codegen_manifest.json"
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def hash_file(file_path):
+    """Hash of a file's contents, or None if it does not exist."""
+    try:
+        with open(file_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def file_prompt_hash(model, project_name, project_description, relative_path):
+    """Hash of the inputs that define one file's generated code.
+
+    The rest of the folder structure is deliberately left out so that adding
+    or removing other files does not invalidate code that was already generated.
+    """
+    return hash_text(json.dumps([model, project_name, project_description, relative_path]))
+
+def load_manifest(project_location):
+    """Load the code generation manifest of a project folder, or an empty one."""
+    try:
+        with open(os.path.join(project_location, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"structure_hash": None, "files": {}}
+
+def save_manifest(project_location, manifest):
+    """Atomically write the manifest next to the generated files."""
+    manifest_path = os.path.join(project_location, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def record_file(manifest, relative_path, prompt_hash, output_hash):
+    manifest["files"][relative_path] = {
+        "prompt_hash": prompt_hash,
+        "output_hash": output_hash,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def needs_generation(manifest, project_location, relative_path, prompt_hash):
+    """A file is regenerated when it is new, its prompt changed or it is missing on disk."""
+    entry = manifest["files"].get(relative_path)
+    if entry is None or entry["prompt_hash"] != prompt_hash:
+        return True
+    return not os.path.exists(os.path.join(project_location, relative_path))
+
+def remove_stale_files(manifest, project_location, current_paths):
+    """Drop manifest entries for files that left the structure.
+
+    The file itself is deleted only if it still holds the generated output,
+    so hand-edited files are never lost. Returns the removed relative paths.
+    """
+    removed = []
+    for relative_path in sorted(set(manifest["files"]) - set(current_paths)):
+        entry = manifest["files"].pop(relative_path)
+        file_path = os.path.join(project_location, relative_path)
+        if hash_file(file_path) == entry["output_hash"]:
+            os.remove(file_path)
+        removed.append(relative_path)
+    return removed
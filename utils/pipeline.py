@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from utils.code_generator import generate_code
+from utils.db_handler import get_project
+from utils.folder_setup import create_folders
+from utils.folder_structure_generation import generate_rtl_structure
+from utils.linting import LINT_TIMEOUT, init_db, lint_file_cached, store_linting_results
+from utils.synthesis import (SYNTHESIS_TIMEOUT, artifact_key, artifact_names, file_synthesis_commands,
+                             is_up_to_date, load_synthesis_manifest, save_synthesis_manifest, synthesize_file)
+from utils.tracing import bind_context, traced
+
+def lint_passed(lint_output):
+    """Warnings are fine; any Verilator error stops the file from being synthesized.
+
+    Verilator ends a run with warnings in "%Error: Exiting due to N warning(s)",
+    which is not counted as an error here.
+    """
+    return not any(line.startswith("%Error") and not line.startswith("%Error: Exiting due to")
+                   for line in lint_output.splitlines())
+
+@traced("pipeline")
+def run_pipeline(project_name=None, base_path=".", description=None, codegen_workers=8, lint_jobs=None,
+                 synthesis_jobs=None, lint_timeout=LINT_TIMEOUT, synthesis_timeout=SYNTHESIS_TIMEOUT,
+                 progress_callback=None, **codegen_options):
+    """Run structure -> folders -> code -> lint -> synthesis for a project as a per-file DAG.
+
+    With a `description` a new structure is generated first; otherwise the
+    stored structure of `project_name` is used. Each Verilog file is linted
+    as soon as its code is written, and synthesized (testbenches excluded)
+    as soon as its lint passes, so the three stages overlap. Each stage has
+    its own worker pool. `progress_callback(stage, file_path, status)` is
+    called from the calling thread as files move through the stages.
+
+    Returns a summary dict with the project root and per-file stage results.
+    """
+    if description:
+        project_name = json.loads(generate_rtl_structure(description)).get("project_name", "Unnamed Project")
+    project = get_project(project_name)
+    if not project:
+        raise ValueError(f"No folder structure found for project: {project_name}")
+
+    project_root = create_folders(base_path, project)
+    output_folder = os.path.join(project_root, "synthesized_images")
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = load_synthesis_manifest(output_folder)
+    names = artifact_names(project, project_root)
+    files = {}
+
+    def kind_of(file_path):
+        project_file = project.get(os.path.relpath(file_path, project_root))
+        return project_file.kind if project_file else None
+
+    def report(stage, file_path, status):
+        files.setdefault(os.path.relpath(file_path, project_root), {})[stage] = status
+        if progress_callback:
+            progress_callback(stage, file_path, status)
+
+    written = queue.Queue()  # Files whose code is ready, filled by the generation thread
+    generation = {}
+
+    def generate():
+        try:
+            # Up-to-date files are queued before any request is sent, so they are linted while the rest generate
+            generation["result"] = generate_code(
+                project_name, project_root, max_workers=codegen_workers,
+                progress_callback=lambda done, total, file_path, error: written.put((file_path, error)),
+                skip_callback=lambda file_path: written.put((file_path, None)), **codegen_options)
+        except Exception as e:
+            generation["error"] = str(e)
+        finally:
+            written.put(None)
+
+    def synthesize(vfile, key):
+        return synthesize_file(vfile, output_folder, synthesis_timeout, names[vfile]) + (key,)
+
+    # Threads start without the active run, so their spans are recorded through bind_context
+    synthesize, lint_file = bind_context(synthesize), bind_context(lint_file_cached)
+
+    generator = threading.Thread(target=bind_context(generate), name="pipeline-codegen")
+    generator.start()
+    lint_results = []
+    with ThreadPoolExecutor(max_workers=lint_jobs or os.cpu_count() or 1) as lint_pool, \
+            ThreadPoolExecutor(max_workers=synthesis_jobs or os.cpu_count() or 1) as synthesis_pool:
+        stages, generating = {}, True
+        while generating or stages:
+            try:
+                while True:
+                    item = written.get(timeout=0.05 if not stages else 0)
+                    if item is None:
+                        generating = False
+                        break
+                    file_path, error = item
+                    report("code", file_path, f"error: {error}" if error else "ready")
+                    if not error and kind_of(file_path) in ("rtl", "testbench"):
+                        stages[lint_pool.submit(lint_file, file_path, lint_timeout)] = ("lint", file_path)
+            except queue.Empty:
+                pass
+            if not stages:
+                continue
+
+            finished, _ = wait(stages, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, file_path = stages.pop(future)
+                if stage == "lint":
+                    lint_output = future.result()
+                    lint_results.append((os.path.relpath(file_path, project_root), lint_output))
+                    passed = lint_passed(lint_output)
+                    report("lint", file_path, ("warnings" if lint_output else "clean") if passed else "errors")
+                    if not passed or kind_of(file_path) != "rtl":
+                        continue
+                    name = names[file_path]
+                    key = artifact_key("file", file_synthesis_commands(file_path, output_folder, name), [file_path])
+                    if is_up_to_date(manifest, output_folder, name, key):
+                        report("synthesis", file_path, "cached")
+                    else:
+                        stages[synthesis_pool.submit(synthesize, file_path, key)] = ("synthesis", file_path)
+                else:
+                    base_name, _, error, key = future.result()
+                    if error is None:
+                        manifest[base_name] = key
+                        save_synthesis_manifest(output_folder, manifest)
+                    report("synthesis", file_path, f"error: {error}" if error else "done")
+    generator.join()
+
+    save_synthesis_manifest(output_folder, manifest)
+    conn, c = init_db()
+    store_linting_results(c, conn, project_name, project_root, lint_results)
+    return {
+        "project_name": project_name,
+        "project_root": project_root,
+        "code_generation": generation.get("result", {}).get("message") or generation.get("error"),
+        "files": files,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the RTL pipeline: structure, folders, code, lint, synthesis.")
+    parser.add_argument("project", nargs="?", help="stored project name (omit with --describe)")
+    parser.add_argument("--describe", help="generate a new structure from this project description")
+    parser.add_argument("--path", default=".", help="base directory for the project folder")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent code generation requests")
+    parser.add_argument("--lint-jobs", type=int, help="parallel Verilator runs (default: CPU count)")
+    parser.add_argument("--synthesis-jobs", type=int, help="parallel Yosys runs (default: CPU count)")
+    args = parser.parse_args(argv)
+    if not args.project and not args.describe:
+        parser.error("a project name or --describe is required")
+
+    summary = run_pipeline(args.project, args.path, args.describe, args.workers, args.lint_jobs, args.synthesis_jobs,
+                           progress_callback=lambda stage, file_path, status: print(
+                               f"{stage:<10} {status:<10} {file_path}", file=sys.stderr))
+    print(json.dumps(summary, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import re
+import json
+import hashlib
+from dataclasses import dataclass, field
+
+RTL_SUFFIXES = (".v", ".sv")
+HEADER_SUFFIXES = (".vh", ".svh")
+CONSTRAINT_SUFFIXES = (".xdc", ".sdc", ".pcf", ".ucf", ".lpf", ".qsf")
+TESTBENCH_DIRS = ("tb", "test", "tests", "sim")  # Everything under these top-level directories is a testbench
+RTL_DIRS = ("src", "rtl", "hdl", "design")  # Everything under these is design code, whatever its name
+TESTBENCH_NAME_RE = re.compile(r"^(?:tb|test)_|_(?:tb|test)$|testbench$", re.I)  # e.g. tb_alu, alu_tb, aluTestBench
+FILE_KINDS = ("rtl", "testbench", "header", "constraint", "other")
+
+def classify_file(file_name, top_directory):
+    """Kind of a structure file: rtl, testbench, header, constraint or other.
+
+    Verilog files are testbenches when they sit under a TESTBENCH_DIRS
+    directory. Outside the TESTBENCH_DIRS and RTL_DIRS directories, a tb/test
+    affix in the name (tb_alu, alu_tb) marks a testbench too; inside RTL_DIRS
+    only the directory counts, so src/test_ctrl.v stays design code.
+    """
+    stem, suffix = os.path.splitext(file_name)
+    suffix = suffix.lower()
+    if suffix in RTL_SUFFIXES:
+        top_directory = top_directory.lower()
+        if top_directory in TESTBENCH_DIRS:
+            return "testbench"
+        if top_directory not in RTL_DIRS and TESTBENCH_NAME_RE.search(stem):
+            return "testbench"
+        return "rtl"
+    if suffix in HEADER_SUFFIXES:
+        return "header"
+    if suffix in CONSTRAINT_SUFFIXES:
+        return "constraint"
+    return "other"
+
+@dataclass(frozen=True, slots=True)
+class ProjectFile:
+    path: str  # Relative to the project root, e.g. "src/alu.v"
+    name: str
+    directory: str
+    kind: str
+
+@dataclass(frozen=True, slots=True)
+class ProjectDirectory:
+    path: str  # Relative to the project root
+    name: str
+    top: str  # Top-level directory it belongs to, e.g. "src" for "src/core"
+    files: tuple
+
+@dataclass(frozen=True, slots=True)
+class ProjectStructure:
+    """A project's folder structure, flattened and indexed once when it is loaded.
+
+    `directories` holds every directory, nested ones included, parents before
+    their children; `files` every file in the same order. `hash` covers the
+    project name, directories and files but not the metadata.
+    """
+    project_name: str
+    directories: tuple
+    files: tuple
+    hash: str
+    raw: dict = field(default=None, compare=False, repr=False)  # The stored structure dict
+    index: dict = field(default=None, compare=False, repr=False)  # Relative path -> ProjectFile
+    by_kind: dict = field(default=None, compare=False, repr=False)  # Kind -> tuple of ProjectFiles
+
+    @classmethod
+    def from_dict(cls, folder_structure):
+        """Build the model from a stored structure dict, walking nested directories iteratively."""
+        directories, files = [], []
+        pending = [("", None, directory) for directory in reversed(folder_structure.get("directories", []))]
+        while pending:
+            parent_path, top, directory = pending.pop()
+            dir_path = os.path.join(parent_path, directory["name"]) if parent_path else directory["name"]
+            top = top or directory["name"]
+            names = tuple(directory.get("files", []))
+            directories.append(ProjectDirectory(dir_path, directory["name"], top, names))
+            files += [ProjectFile(os.path.join(dir_path, name), name, dir_path, classify_file(name, top))
+                      for name in names]
+            pending += [(dir_path, top, subdir) for subdir in reversed(directory.get("subdirectories", []))]
+
+        project_name = folder_structure.get("project_name", "")
+        layout = json.dumps([project_name, [(directory.path, directory.files) for directory in directories]],
+                            separators=(",", ":"))
+        by_kind = {kind: tuple(file for file in files if file.kind == kind) for kind in FILE_KINDS}
+        return cls(project_name, tuple(directories), tuple(files), hashlib.sha256(layout.encode("utf-8")).hexdigest(),
+                   folder_structure, {file.path: file for file in files}, by_kind)
+
+    def files_of(self, *kinds):
+        """Files of the given kinds, in structure order."""
+        if len(kinds) == 1:
+            return self.by_kind.get(kinds[0], ())
+        return tuple(file for file in self.files if file.kind in kinds)
+
+    def paths(self, root, *kinds):
+        """Paths under `root` of all files, or of the files of the given kinds."""
+        return [os.path.join(root, file.path) for file in (self.files_of(*kinds) if kinds else self.files)]
+
+    def get(self, relative_path):
+        """The file at a path relative to the project root, or None."""
+        return self.index.get(os.path.normpath(relative_path))
@@ -1,97 +1,347 @@
-import streamlit as st
 import os
-import sqlite3
+import re
 import subprocess
 import json
-from PIL import Image
-
-def get_project_list():
-    """Fetch project names from the database."""
-    conn = sqlite3.connect("database/folder_structure.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT project_name FROM folder_structures")
-    projects = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return projects
-
-def get_folder_structure(project_name):
-    """Fetch folder structure from the database."""
-    conn = sqlite3.connect("database/folder_structure.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT folder_structure FROM folder_structures WHERE project_name=?", (project_name,))
-    result = cursor.fetchone()
-    conn.close()
-    return json.loads(result[0]) if result else None
-
-def find_verilog_files(folder_structure, root_path):
-    """Find all Verilog files based on the stored folder structure."""
-    verilog_files = []
-    for directory in folder_structure.get("directories", []):
-        dir_path = os.path.join(root_path, directory["name"])
-        for file in directory["files"]:
-            if file.endswith(".v") or file.endswith(".sv"):
-                file_path = os.path.join(dir_path, file)
-                if os.path.exists(file_path):
-                    verilog_files.append(file_path)
-    return verilog_files
-
-def run_synthesis(folder_path, project_name):
-    """Run synthesis using Yosys for all Verilog files, continue on errors."""
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.db_handler import get_project
+from utils.manifest import hash_file, hash_text
+from utils.tracing import bind_context, run_tool, traced
+
+SYNTHESIS_TIMEOUT = 300  # Seconds allowed for each Yosys or netlistsvg run
+
+COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+MODULE_RE = re.compile(r"\bmodule\s+(\w+)(.*?)\bendmodule\b", re.S)
+INCLUDE_RE = re.compile(r'`include\s+"([^"]+)"')
+SYNTHESIS_MANIFEST = ".synthesis_manifest.json"
+GALLERY_PAGE_SIZE = 12  # Netlist thumbnails sent to the browser per page
+GALLERY_COLUMNS = 3
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_MAX_BYTES = 512 * 1024  # Larger SVGs are only rendered when opened
+
+def find_verilog_files(project, root_path, include_testbenches=True):
+    """Find the Verilog files of a project structure that exist under `root_path`."""
+    kinds = ("rtl", "testbench") if include_testbenches else ("rtl",)
+    return [file_path for file_path in project.paths(root_path, *kinds) if os.path.exists(file_path)]
+
+def artifact_names(project, root_path):
+    """Map each Verilog file path under `root_path` to the name of its synthesis artifacts.
+
+    The name is the file name without extension, or, when several files
+    share that name, the relative path with directories joined by "__"
+    (`src/core/top.v` -> `src__core__top`), so no two files write the same
+    JSON and SVG.
+    """
+    files = project.files_of("rtl", "testbench")
+    stems = [os.path.splitext(os.path.basename(file.path))[0] for file in files]
+    return {os.path.join(root_path, file.path): stem if stems.count(stem) == 1
+            else os.path.splitext(file.path)[0].replace(os.sep, "__")
+            for file, stem in zip(files, stems)}
+
+def synthesize_file(vfile, output_folder, timeout=SYNTHESIS_TIMEOUT, name=None):
+    """Synthesize one Verilog file with Yosys and render it with netlistsvg.
+
+    Commands are passed with `-p`, so concurrent jobs never share a script
+    file. Outputs are named `name` (the file name by default). Returns
+    (name, output_image, error); output_image is None on failure.
+    """
+    base_name = name or os.path.splitext(os.path.basename(vfile))[0]
+    output_json = os.path.join(output_folder, f"{base_name}.json")
+    output_image = os.path.join(output_folder, f"{base_name}.svg")  # Netlistsvg outputs SVG
+
+    yosys_commands = file_synthesis_commands(vfile, output_folder, base_name)
+    try:
+        result = run_tool(["yosys", "-p", yosys_commands], capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return base_name, None, f"yosys timed out after {timeout} seconds"
+    if result.returncode != 0:
+        return base_name, None, result.stderr
+
+    return render_netlist(base_name, output_json, output_image, timeout)
+
+def file_synthesis_commands(vfile, output_folder, name=None):
+    """Yosys commands that synthesize a single file as its own top module, writing `name`.json."""
+    top = os.path.splitext(os.path.basename(vfile))[0]
+    return f"read_verilog {vfile}; synth -top {top}; write_json {os.path.join(output_folder, name or top)}.json"
+
+def render_netlist(base_name, output_json, output_image, timeout=SYNTHESIS_TIMEOUT):
+    """Generate an SVG from a Yosys JSON netlist using netlistsvg."""
+    try:
+        netlist_result = run_tool(["netlistsvg", output_json, "-o", output_image],
+                                        capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return base_name, None, f"netlistsvg timed out after {timeout} seconds"
+
+    if netlist_result.returncode != 0:
+        return base_name, None, netlist_result.stderr
+    return base_name, output_image, None
+
+def parse_modules(verilog_files):
+    """Map every module declared in the files to (declaring file, module body)."""
+    modules = {}
+    for vfile in verilog_files:
+        with open(vfile) as f:
+            source = COMMENT_RE.sub("", f.read())
+        for name, body in MODULE_RE.findall(source):
+            modules[name] = (vfile, body)
+    return modules
+
+def find_module_graph(verilog_files, modules=None):
+    """Map every module declared in the files to the set of declared modules it instantiates."""
+    bodies = {name: body for name, (_, body) in (modules or parse_modules(verilog_files)).items()}
+    graph = {}
+    for name, body in bodies.items():
+        graph[name] = {child for child in bodies
+                       if child != name and re.search(rf"\b{child}\s*(?:#\s*\(|\w+\s*\()", body)}
+    return graph
+
+def find_top_modules(graph):
+    """Modules that no other module instantiates."""
+    instantiated = set().union(*graph.values()) if graph else set()
+    return sorted(name for name in graph if name not in instantiated)
+
+def reachable_modules(graph, tops):
+    """All modules in the hierarchy below (and including) the given tops."""
+    seen, stack = set(), list(tops)
+    while stack:
+        name = stack.pop()
+        if name not in seen:
+            seen.add(name)
+            stack.extend(graph.get(name, ()))
+    return sorted(seen)
+
+def synthesize_hierarchy(verilog_files, output_folder, top_module=None, timeout=SYNTHESIS_TIMEOUT):
+    """Synthesize all files in a single Yosys session and write one JSON netlist per module.
+
+    Top modules are detected from the instantiation graph unless
+    `top_module` is given. Returns (modules, error): the synthesized module
+    names, or an error message when Yosys fails.
+    """
+    graph = find_module_graph(verilog_files)
+    if top_module and top_module not in graph:
+        return [], f"Top module {top_module} is not declared in the project files."
+    tops = [top_module] if top_module else find_top_modules(graph)
+    modules = reachable_modules(graph, tops)
+    if not modules:
+        return [], "No modules found for synthesis."
+
+    commands = [f"read_verilog -sv {vfile}" if vfile.endswith(".sv") else f"read_verilog {vfile}"
+                for vfile in verilog_files]
+    # A single top lets hierarchy drop unused modules; several tops keep everything that was read
+    commands += [f"hierarchy -check -top {tops[0]}" if len(tops) == 1 else "hierarchy -check",
+                 f"synth -top {tops[0]}" if len(tops) == 1 else "synth"]
+    for module in modules:
+        commands += [f"select {module}", f"write_json -selected {os.path.join(output_folder, module)}.json",
+                     "select -clear"]
+
+    try:
+        result = run_tool(["yosys", "-p", "; ".join(commands)], capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return [], f"yosys timed out after {timeout} seconds"
+    if result.returncode != 0:
+        return [], result.stderr or result.stdout
+    return modules, None
+
+@lru_cache(maxsize=None)
+def get_tool_version(tool, flag):
+    """Version string of an EDA tool, part of every artifact cache key."""
+    try:
+        return run_tool([tool, flag], capture_output=True, text=True).stdout.strip()
+    except FileNotFoundError:
+        return "unknown"
+
+def find_includes(vfile, seen=None):
+    """The file itself plus every file it pulls in with `include, recursively."""
+    seen = seen if seen is not None else []
+    if vfile in seen:
+        return seen
+    seen.append(vfile)
+    try:
+        with open(vfile) as f:
+            source = f.read()
+    except FileNotFoundError:
+        return seen
+    for include in INCLUDE_RE.findall(source):
+        find_includes(os.path.normpath(os.path.join(os.path.dirname(vfile), include)), seen)
+    return seen
+
+def artifact_key(mode, script, input_files):
+    """Hash of everything an artifact depends on: inputs, tool versions and the Yosys script."""
+    inputs = []
+    for vfile in input_files:
+        for dependency in find_includes(vfile):
+            inputs.append((dependency, hash_file(dependency)))
+    return hash_text(json.dumps([mode, script, get_tool_version("yosys", "-V"),
+                                 get_tool_version("netlistsvg", "--version"), inputs]))
+
+def load_synthesis_manifest(output_folder):
+    try:
+        with open(os.path.join(output_folder, SYNTHESIS_MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_synthesis_manifest(output_folder, manifest):
+    manifest_path = os.path.join(output_folder, SYNTHESIS_MANIFEST)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def is_up_to_date(manifest, output_folder, name, key):
+    """An artifact is reused when its key matches and both JSON and SVG outputs exist."""
+    return (manifest.get(name) == key
+            and os.path.exists(os.path.join(output_folder, f"{name}.json"))
+            and os.path.exists(os.path.join(output_folder, f"{name}.svg")))
+
+@traced("synthesis")
+def iter_synthesis(folder_path, project_name, max_workers=None, timeout=SYNTHESIS_TIMEOUT, mode="file",
+                   top_module=None, force=False, total_callback=None):
+    """Synthesize all Verilog files of a project concurrently.
+
+    In `mode="file"` every file gets its own Yosys run. In
+    `mode="hierarchical"` the design files (testbenches excluded)
+    are elaborated together in one Yosys session with the given or detected
+    top modules, and one netlist is rendered per module.
+
+    Artifacts whose inputs (including `include files and, in hierarchical
+    mode, instantiated submodules), tool versions and script are unchanged
+    since the last run are reused unless `force` is set.
+
+    Yields (base_name, output_image, error, cached) for each file or module
+    as soon as its jobs finish; `total_callback(count)`, if given, is called
+    with the number of files or modules before the first one is yielded.
+    Raises ValueError when there is nothing to synthesize.
+    """
     output_folder = os.path.join(folder_path, "synthesized_images")
     os.makedirs(output_folder, exist_ok=True)
     
-    folder_structure = get_folder_structure(project_name)
-    if not folder_structure:
-        return "No folder structure found."
+    project = get_project(project_name)
+    if not project:
+        raise ValueError("No folder structure found.")
     
-    verilog_files = find_verilog_files(folder_structure, folder_path)
+    verilog_files = find_verilog_files(project, folder_path, include_testbenches=mode != "hierarchical")
     if not verilog_files:
-        return "No Verilog files found for synthesis."
+        raise ValueError("No Verilog files found for synthesis.")
 
-    error_logs = {}
-    success_files = []
-
-    for vfile in verilog_files:
-        base_name = os.path.splitext(os.path.basename(vfile))[0]
-        output_image = os.path.join(output_folder, f"{base_name}.svg")  # Netlistsvg outputs SVG
-
-        yosys_script = f"""
-        read_verilog {vfile}
-        synth -top {base_name}
-        write_json {output_folder}/{base_name}.json
-        """
-
-        script_path = os.path.join(folder_path, "synthesis.ys")
-        with open(script_path, "w") as f:
-            f.write(yosys_script)
+    manifest = {} if force else load_synthesis_manifest(output_folder)
+    keys = {}
+    if mode == "hierarchical":
+        modules = parse_modules(verilog_files)
+        graph = find_module_graph(verilog_files, modules)
+        if top_module and top_module not in graph:
+            yield project_name, None, f"Top module {top_module} is not declared in the project files.", False
+            return
+        tops = [top_module] if top_module else find_top_modules(graph)
+        for module in reachable_modules(graph, tops):
+            # A module's netlist depends on the files declaring it and everything below it
+            dependency_files = sorted({modules[name][0] for name in reachable_modules(graph, [module])})
+            keys[module] = artifact_key(mode, top_module or "", dependency_files)
+    else:
+        names = artifact_names(project, folder_path)
+        for vfile in verilog_files:
+            keys[names[vfile]] = artifact_key(mode, file_synthesis_commands(vfile, output_folder, names[vfile]),
+                                              [vfile])
 
-        result = subprocess.run(["yosys", "-s", script_path], capture_output=True, text=True)
+    if total_callback:
+        total_callback(len(keys))
+    stale = [name for name, key in keys.items() if not is_up_to_date(manifest, output_folder, name, key)]
+    for name in keys:
+        if name not in stale:
+            yield name, os.path.join(output_folder, f"{name}.svg"), None, True
 
-        if result.returncode != 0:
-            error_logs[base_name] = result.stderr
-            continue  # Skip to the next file
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+            if mode == "hierarchical" and (stale or not keys):
+                # Stale modules pull in their ancestors, so reading the files below them is enough
+                session_files = [vfile for vfile in verilog_files
+                                 if vfile in {modules[name][0] for name in reachable_modules(graph, stale)}]
+                synthesized, error = synthesize_hierarchy(session_files or verilog_files, output_folder,
+                                                          top_module, timeout)
+                if error:
+                    yield project_name, None, error, False
+                    return
+                render = bind_context(render_netlist)  # Tool spans belong to this run
+                futures = [executor.submit(render, module, os.path.join(output_folder, f"{module}.json"),
+                                           os.path.join(output_folder, f"{module}.svg"), timeout)
+                           for module in synthesized if module in stale]
+            elif mode == "hierarchical":
+                futures = []
+            else:
+                synthesize = bind_context(synthesize_file)
+                futures = [executor.submit(synthesize, vfile, output_folder, timeout, names[vfile])
+                           for vfile in verilog_files if names[vfile] in stale]
+            for future in as_completed(futures):
+                base_name, output_image, error = future.result()
+                if error is None:
+                    manifest[base_name] = keys[base_name]
+                else:
+                    manifest.pop(base_name, None)
+                save_synthesis_manifest(output_folder, manifest)  # Finished jobs survive a crash or a killed run
+                yield base_name, output_image, error, False
+    finally:
+        save_synthesis_manifest(output_folder, manifest)
 
-        # Generate SVG using Netlistsvg
-        netlistsvg_command = f"netlistsvg {output_folder}/{base_name}.json -o {output_image}"
-        netlist_result = subprocess.run(netlistsvg_command.split(), capture_output=True, text=True)
+def run_synthesis(folder_path, project_name, max_workers=None, timeout=SYNTHESIS_TIMEOUT, mode="file",
+                  top_module=None, force=False):
+    """Run synthesis using Yosys for all Verilog files, continue on errors."""
+    error_logs = {}
+    success_files = []
 
-        if netlist_result.returncode == 0:
-            success_files.append(output_image)
-        else:
-            error_logs[base_name] = netlist_result.stderr
+    try:
+        for base_name, output_image, error, _ in iter_synthesis(folder_path, project_name, max_workers, timeout,
+                                                                mode, top_module, force):
+            if error is None:
+                success_files.append(output_image)
+            else:
+                error_logs[base_name] = error
+    except ValueError as e:
+        return str(e)
 
     return success_files, error_logs
 
-def display_results(success_files, error_logs):
-    """Display synthesis results with images and errors."""
-    if success_files:
-        st.subheader("✅ Successfully Synthesized Images")
-        for img_file in success_files:
-            if os.path.exists(img_file):
-                st.image(img_file, caption=os.path.basename(img_file), use_column_width=True)
+def list_synthesis_images(output_folder):
+    """(name, svg path, size in bytes) of every rendered netlist, sorted by name, without reading them."""
+    try:
+        entries = [(entry.name[:-len(".svg")], entry.path, entry.stat().st_size) for entry in os.scandir(output_folder)
+                   if entry.name.endswith(".svg") and entry.is_file()]
+    except FileNotFoundError:
+        return []
+    return sorted(entries)
 
+def display_results(images, error_logs, key="synthesis", page_size=GALLERY_PAGE_SIZE):
+    """Display synthesis errors and one page of netlist thumbnails.
+
+    `images` are list_synthesis_images entries. Only the current page is
+    sent to the browser, SVGs above THUMBNAIL_MAX_BYTES are not inlined, and
+    a full netlist is loaded when its "Open" button is pressed.
+    """
+    import streamlit as st
     if error_logs:
-        st.subheader("⚠ Errors in Synthesis")
-        for file, error in error_logs.items():
-            st.error(f"Error in {file}.v:\n{error}")
+        with st.expander(f"⚠ Errors in Synthesis ({len(error_logs)})", expanded=True):
+            for file, error in list(error_logs.items())[:page_size]:
+                st.error(f"Error in {file}.v:\n{error}")
+            if len(error_logs) > page_size:
+                st.caption(f"{len(error_logs) - page_size} more errors not shown.")
+
+    if not images:
+        return
+    st.subheader(f"✅ Synthesized Netlists ({len(images)})")
+    pages = max(1, -(-len(images) // page_size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    columns = st.columns(GALLERY_COLUMNS)
+    for index, (name, image_path, size) in enumerate(images[(page - 1) * page_size:page * page_size]):
+        with columns[index % GALLERY_COLUMNS]:
+            if size <= THUMBNAIL_MAX_BYTES:
+                st.image(image_path, caption=name, width=THUMBNAIL_WIDTH)
+            else:
+                st.caption(f"{name} ({size / (1024 * 1024):.1f} MB, too large for a thumbnail)")
+            if st.button("Open", key=f"{key}_open_{name}"):
+                st.session_state[f"{key}_open"] = image_path
 
+    opened = st.session_state.get(f"{key}_open")
+    if opened and os.path.exists(opened):
+        st.subheader(os.path.basename(opened))
+        st.image(opened, use_column_width=True)
+        with open(opened, "rb") as f:
+            st.download_button("Download SVG", f.read(), file_name=os.path.basename(opened), mime="image/svg+xml",
+                               key=f"{key}_download")
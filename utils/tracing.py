@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import sqlite3
+import inspect
+import secrets
+import threading
+import contextvars
+import subprocess
+from functools import wraps
+from contextlib import contextmanager
+
+TRACE_EXPORT_ENV = "TRACE_EXPORT_FILE"  # When set, every finished run is appended there as OTLP/JSON
+STATEMENT_PREVIEW = 200  # Characters of a SQL statement kept on its span
+TRACE_RUNS_KEPT = 100  # Runs (with their spans) kept per project
+PERCENTILE_RUNS = 20  # Latency percentiles cover this many most recent runs
+
+# The run being traced in this context. Each thread (e.g. each Streamlit session) starts without one;
+# pool workers record into their submitter's run only when submitted through bind_context.
+_active_run = contextvars.ContextVar("active_run", default=None)
+
+class Run:
+    """A traced run of one stage for a project, collecting spans in memory until it ends."""
+
+    def __init__(self, project_name, kind):
+        self.project_name = project_name
+        self.kind = kind
+        self.started_at = time.time()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+@contextmanager
+def span(kind, name, **attributes):
+    """Time a block as a span of the active run; the yielded dict takes exit_code, bytes and token counts.
+
+    Outside a traced run this does nothing beyond yielding the dict.
+    """
+    record = dict(attributes)
+    run = _active_run.get()
+    if run is None:
+        yield record
+        return
+    started_at, started = time.time(), time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        record.update(kind=kind, name=name, started_at=started_at, duration=time.perf_counter() - started)
+        run.add(record)
+
+def run_tool(command, **kwargs):
+    """subprocess.run, recorded as a span with the exit code and bytes passed in and out."""
+    with span("subprocess", os.path.basename(command[0])) as record:
+        record["bytes_in"] = sum(len(str(arg)) for arg in command) + len(kwargs.get("input") or "")
+        result = subprocess.run(command, **kwargs)
+        record["exit_code"] = result.returncode
+        record["bytes_out"] = len(result.stdout or "") + len(result.stderr or "")
+        return result
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        if _active_run.get() is None:
+            return super().execute(sql, parameters)
+        with span("db", sql.split(None, 1)[0].upper(), statement=" ".join(sql.split())[:STATEMENT_PREVIEW]):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if _active_run.get() is None:
+            return super().executemany(sql, seq_of_parameters)
+        with span("db", sql.split(None, 1)[0].upper(), statement=" ".join(sql.split())[:STATEMENT_PREVIEW]) as record:
+            cursor = super().executemany(sql, seq_of_parameters)
+            record["rows"] = self.rowcount
+            return cursor
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose queries are recorded as spans while a run is traced."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute does not go through cursor(), so route the shortcuts explicitly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def save_run(run, status, error=None):
+    """Store a finished run and its spans in one transaction and return the run id.
+
+    Only the latest TRACE_RUNS_KEPT runs of each project are kept.
+    """
+    from utils.db_handler import get_connection
+    conn = get_connection()
+    with conn:
+        run_id = conn.execute("INSERT INTO runs (project_name, kind, status, error, started_at, ended_at) "
+                              "VALUES (?, ?, ?, ?, ?, ?)",
+                              (run.project_name, run.kind, status, error, run.started_at, time.time())).lastrowid
+        conn.executemany("""
+            INSERT INTO spans (run_id, kind, name, started_at, duration, exit_code, bytes_in, bytes_out,
+                               tokens_in, tokens_out, detail)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(run_id, record.pop("kind"), record.pop("name"), record.pop("started_at"), record.pop("duration"),
+               record.pop("exit_code", None), record.pop("bytes_in", None), record.pop("bytes_out", None),
+               record.pop("tokens_in", None), record.pop("tokens_out", None), json.dumps(record) if record else None)
+              for record in run.spans])
+
+        stale_runs = "SELECT id FROM runs WHERE project_name IS ? ORDER BY id DESC LIMIT -1 OFFSET ?"
+        conn.execute(f"DELETE FROM spans WHERE run_id IN ({stale_runs})", (run.project_name, TRACE_RUNS_KEPT))
+        conn.execute(f"DELETE FROM runs WHERE id IN ({stale_runs})", (run.project_name, TRACE_RUNS_KEPT))
+    return run_id
+
+def bind_context(function):
+    """Wrap `function` so every call runs in a copy of the caller's current context.
+
+    Threads do not inherit context variables, so work handed to a pool or a
+    thread goes through this to record its spans into the active run.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(function, *args, **kwargs)
+
+@contextmanager
+def trace_run(project_name, kind):
+    """Trace everything done inside the block in this context as one run.
+
+    Nested calls (e.g. code generation inside the pipeline) join the outer
+    run; other threads and sessions are not recorded unless their work was
+    submitted through bind_context. The run is stored when the block ends,
+    and exported to the file named by TRACE_EXPORT_FILE, if set.
+    """
+    outer = _active_run.get()
+    if outer is not None:
+        yield outer
+        return
+    run = Run(project_name, kind)
+    token = _active_run.set(run)
+    status, error = "done", None
+    try:
+        yield run
+    except GeneratorExit:  # A traced generator that was closed early still finished normally
+        raise
+    except BaseException as e:
+        status, error = "failed", str(e)
+        raise
+    finally:
+        _active_run.reset(token)
+        run_id = save_run(run, status, error)
+        if os.getenv(TRACE_EXPORT_ENV):
+            export_run(run_id, os.getenv(TRACE_EXPORT_ENV))
+
+def traced(kind):
+    """Decorator running a stage function (or generator) inside trace_run, keyed by its `project_name` argument."""
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        def project_of(args, kwargs):
+            return signature.bind_partial(*args, **kwargs).arguments.get("project_name")
+
+        if inspect.isgeneratorfunction(function):
+            def traced_generator(args, kwargs):
+                with trace_run(project_of(args, kwargs), kind):
+                    yield from function(*args, **kwargs)
+
+            # The run is active only while the generator itself executes, in a context of its own,
+            # never in the consumer's code between two items
+            @wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                context = contextvars.copy_context()
+                generator = traced_generator(args, kwargs)
+                try:
+                    while True:
+                        try:
+                            item = context.run(next, generator)
+                        except StopIteration as stop:
+                            return stop.value
+                        yield item
+                finally:
+                    context.run(generator.close)
+            return generator_wrapper
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with trace_run(project_of(args, kwargs), kind):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def list_runs(project_name=None, limit=50):
+    """Most recent runs first, as dicts with their span count."""
+    from utils.db_handler import get_connection
+    query = ("SELECT runs.id, runs.project_name, runs.kind, runs.status, runs.error, runs.started_at, runs.ended_at, "
+             "(SELECT COUNT(*) FROM spans WHERE spans.run_id = runs.id) FROM runs")
+    parameters = ()
+    if project_name:
+        query, parameters = query + " WHERE project_name = ?", (project_name,)
+    rows = get_connection().execute(query + " ORDER BY runs.id DESC LIMIT ?", parameters + (limit,))
+    return [dict(zip(("id", "project_name", "kind", "status", "error", "started_at", "ended_at", "spans"), row))
+            for row in rows]
+
+def get_spans(run_id):
+    """Spans of a run in start order."""
+    from utils.db_handler import get_connection
+    rows = get_connection().execute("SELECT kind, name, started_at, duration, exit_code, bytes_in, bytes_out, "
+                                    "tokens_in, tokens_out, detail FROM spans WHERE run_id = ? ORDER BY started_at",
+                                    (run_id,))
+    spans = []
+    for row in rows:
+        record = dict(zip(("kind", "name", "started_at", "duration", "exit_code", "bytes_in", "bytes_out",
+                           "tokens_in", "tokens_out"), row[:9]))
+        record["detail"] = json.loads(row[9]) if row[9] else {}
+        spans.append(record)
+    return spans
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+def tool_percentiles(project_name=None, runs=PERCENTILE_RUNS):
+    """Per (kind, name) over the spans of the last `runs` runs: span count, p50 and p95 duration in seconds,
+    and total time."""
+    from utils.db_handler import get_connection
+    recent_runs = "SELECT id FROM runs"
+    parameters = ()
+    if project_name:
+        recent_runs += " WHERE project_name = ?"
+        parameters = (project_name,)
+    query = f"SELECT kind, name, duration FROM spans WHERE run_id IN ({recent_runs} ORDER BY id DESC LIMIT ?)"
+    durations = {}
+    for kind, name, duration in get_connection().execute(query, parameters + (runs,)):
+        durations.setdefault((kind, name), []).append(duration)
+    stats = []
+    for (kind, name), values in sorted(durations.items()):
+        values.sort()
+        stats.append({"kind": kind, "name": name, "count": len(values), "p50": percentile(values, 0.5),
+                      "p95": percentile(values, 0.95), "total": sum(values)})
+    return stats
+
+def otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def export_run(run_id, path):
+    """Append a run to `path` as one OTLP/JSON line (the OpenTelemetry file exporter format)."""
+    from utils.db_handler import get_connection
+    row = get_connection().execute("SELECT project_name, kind, status, started_at, ended_at FROM runs WHERE id = ?",
+                                   (run_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"No run with id {run_id}")
+    project_name, kind, status, started_at, ended_at = row
+    trace_id, root_id = secrets.token_hex(16), secrets.token_hex(8)
+    spans = [{"traceId": trace_id, "spanId": root_id, "name": kind, "kind": 1,
+              "startTimeUnixNano": str(int(started_at * 1e9)), "endTimeUnixNano": str(int(ended_at * 1e9)),
+              "attributes": [{"key": "project.name", "value": otlp_value(project_name or "")}],
+              "status": {"code": 2 if status == "failed" else 1}}]
+    for record in get_spans(run_id):
+        attributes = {key: record[key] for key in ("exit_code", "bytes_in", "bytes_out", "tokens_in", "tokens_out")
+                      if record[key] is not None}
+        attributes.update(record["detail"])
+        spans.append({"traceId": trace_id, "spanId": secrets.token_hex(8), "parentSpanId": root_id,
+                      "name": f"{record['kind']} {record['name']}", "kind": 3 if record["kind"] == "llm" else 1,
+                      "startTimeUnixNano": str(int(record["started_at"] * 1e9)),
+                      "endTimeUnixNano": str(int((record["started_at"] + record["duration"]) * 1e9)),
+                      "attributes": [{"key": key, "value": otlp_value(value)} for key, value in attributes.items()]})
+    line = {"resourceSpans": [{"resource": {"attributes": [{"key": "service.name",
+                                                             "value": {"stringValue": "rtl-generator"}}]},
+                               "scopeSpans": [{"scope": {"name": "utils.tracing"}, "spans": spans}]}]}
+    with open(path, "a") as export_file:
+        export_file.write(json.dumps(line) + "\n")